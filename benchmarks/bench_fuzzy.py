@@ -0,0 +1,79 @@
+"""
+Per-message cost of fuzzy keyword matching.
+
+    python -m benchmarks.bench_fuzzy [--keywords 10000] [--runs 20]
+
+Builds a KeywordMatcher with N fuzzy keywords (one user each) and times
+KeywordMatcher.match on a short chat message and a ~4096 character
+announcement. A naive token x keyword comparison is timed on the short
+message for reference.
+"""
+import argparse
+import random
+import string
+import time
+from services.matcher import KeywordMatcher, TOKEN_PATTERN, edit_distance, parse_fuzzy
+
+def random_word(rng, min_len=5, max_len=12):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(min_len, max_len)))
+
+def make_message(rng, vocabulary, length):
+    words = []
+    while sum(len(w) + 1 for w in words) < length:
+        # Mostly noise, sometimes a misspelt keyword
+        if rng.random() < 0.05:
+            word = list(rng.choice(vocabulary))
+            i = rng.randrange(len(word))
+            word[i] = rng.choice(string.ascii_lowercase)
+            words.append("".join(word))
+        else:
+            words.append(random_word(rng, 2, 9))
+    return " ".join(words)[:length]
+
+def time_call(fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = fn()
+    return (time.perf_counter() - start) / runs, result
+
+def naive_match(keywords, text):
+    tokens = set(TOKEN_PATTERN.findall(text.lower()))
+    hits = set()
+    for spec in keywords:
+        term, distance = parse_fuzzy(spec)
+        for token in tokens:
+            if edit_distance(token, term, distance) <= distance:
+                hits.add(spec)
+    return hits
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keywords", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = list({random_word(rng) for _ in range(args.keywords * 2)})[:args.keywords]
+    keywords = {}
+    for i, word in enumerate(vocabulary):
+        distance = 2 if len(word) >= 7 and i % 2 else 1
+        keywords[f"{word}~{distance}"] = {i}
+
+    start = time.perf_counter()
+    matcher = KeywordMatcher(keywords)
+    build = time.perf_counter() - start
+    print(f"fuzzy keywords: {len(matcher.fuzzy)}  index entries: {len(matcher.fuzzy.variants)}  build: {build:.2f}s")
+
+    short = make_message(rng, vocabulary, 300)
+    long = make_message(rng, vocabulary, 4096)
+
+    for name, text in (("300 chars", short), ("4096 chars", long)):
+        per_message, (matches, hits) = time_call(lambda: matcher.match(text), args.runs)
+        tokens = len(set(TOKEN_PATTERN.findall(text)))
+        print(f"indexed  {name:>10}: {per_message * 1000:8.2f} ms/message  ({tokens} tokens, {len(hits)} keywords matched)")
+
+    per_message, hits = time_call(lambda: naive_match(keywords, short), 1)
+    print(f"naive    {'300 chars':>10}: {per_message * 1000:8.2f} ms/message  ({len(hits)} keywords matched)")
+
+if __name__ == "__main__":
+    main()
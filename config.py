@@ -5,4 +5,22 @@ load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = "PingYou"
\ No newline at end of file
+DB_NAME = "PingYou"
+
+# Webhook mode (BOT_MODE=webhook). WEBHOOK_URL is the public https URL Telegram
+# should call; it is registered on start.
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+
+# Number of worker processes group messages are sharded across (0/1 = in-process)
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0"))
+
+# Processes used to match very long messages against large keyword sets off the event loop (0 = always inline)
+MATCH_POOL_WORKERS = int(os.getenv("MATCH_POOL_WORKERS", "2"))
+
+# Local warm-start snapshot of the keyword index (empty = disabled)
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "data/keyword_index.snapshot")
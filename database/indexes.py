@@ -0,0 +1,59 @@
+from pymongo.errors import OperationFailure
+from database.connection import get_db
+from services.history import HISTORY_RETENTION_DAYS
+
+def ensure_indexes():
+    """Create the indexes the bot relies on (no-op if they already exist)"""
+    db = get_db()
+
+    # Retry queue: due-item scan and lease lookup
+    db["delivery_queue"].create_index("next_attempt_at")
+    db["delivery_queue"].create_index("lease", sparse=True)
+    db["delivery_dead_letters"].create_index("user_id")
+
+    # Dead-recipient mute / reactivation
+    db["user_subscriptions"].create_index([("user_id", 1), ("muted_reason", 1)])
+
+    # /keywords dashboard: range paging over the user's groups
+    db["user_subscriptions"].create_index([("user_id", 1), ("subscribed", 1), ("group_name", 1), ("group_id", 1)])
+    db["delivery_queue"].create_index("user_id")
+
+    # Per-group inverted keyword index
+    db["group_keyword_index"].create_index("group_id", unique=True)
+    db["user_subscriptions"].create_index([("group_id", 1), ("subscribed", 1)])
+
+    # Global keywords, looked up by subscriber list
+    db["user_global_keywords"].create_index("user_id", unique=True)
+
+    # Warm-start snapshot catch-up
+    db["group_keyword_index"].create_index("updated_at")
+    db["user_global_keywords"].create_index("updated_at")
+
+    # Quiet hours and their deferred digests
+    db["user_settings"].create_index("user_id", unique=True)
+    db["deferred_deliveries"].create_index([("user_id", 1), ("release_at", 1)])
+
+    # Match history: newest-first range paging, expires after the retention period
+    db["match_history"].create_index([("user_id", 1), ("ts", -1), ("_id", -1)])
+    db["match_history"].create_index("ts", expireAfterSeconds=HISTORY_RETENTION_DAYS * 24 * 3600)
+
+    # Match statistics rollups (read by /stats), expire per granularity
+    db["match_stats"].create_index([("scope", 1), ("owner", 1), ("granularity", 1), ("bucket", 1)])
+    db["match_stats"].create_index("expires_at", expireAfterSeconds=0)
+
+    # PTB persistence: user_data (UI sessions) expires on its own
+    db["bot_persistence"].create_index("expires_at", expireAfterSeconds=0)
+
+    ensure_unique_subscriptions(db)
+
+def ensure_unique_subscriptions(db=None):
+    """One subscription row per (user_id, group_id); fails while duplicates exist"""
+    db = db if db is not None else get_db()
+    try:
+        db["user_subscriptions"].create_index([("user_id", 1), ("group_id", 1)], unique=True)
+        return True
+    except OperationFailure as e:
+        # DuplicateKeyError is an OperationFailure too
+        print(f"[Indexes] Unique (user_id, group_id) index not created: {e}")
+        print("[Indexes] Run `python maintenance.py repair-duplicates` to merge duplicate subscriptions")
+        return False
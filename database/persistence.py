@@ -0,0 +1,225 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+from telegram.ext import BasePersistence, ContextTypes, PersistenceInput
+from database.connection import get_db
+
+db = get_db()
+persistence_collection = db["bot_persistence"]
+
+# How often PTB hands us changed user_data/chat_data (write-behind window)
+PERSISTENCE_UPDATE_INTERVAL = 30
+# user_data only holds UI sessions (/remove selection, /keywords page...).
+# Stored copies expire in Mongo through a TTL index, in-memory copies on access.
+SESSION_TTL = 60 * 60
+SESSION_KEYS = (
+    "remove_kw_data", "kw_page", "kw_page_keys", "awaiting_import",
+    "history_filter", "history_page", "history_page_keys",
+)
+# Idle users/chats are dropped from memory and lazily reloaded on next update
+IDLE_EVICT_SECONDS = 2 * 60 * 60
+EVICTION_INTERVAL = 10 * 60
+
+USER = "user"
+CHAT = "chat"
+
+def encode_data(value):
+    """Make PTB data storable in Mongo (sets aren't BSON)"""
+    if isinstance(value, dict):
+        return {str(k): encode_data(v) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": [encode_data(v) for v in value]}
+    if isinstance(value, (list, tuple)):
+        return [encode_data(v) for v in value]
+    return value
+
+def decode_data(value):
+    if isinstance(value, dict):
+        if set(value) == {"__set__"}:
+            return set(decode_data(v) for v in value["__set__"])
+        return {k: decode_data(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [decode_data(v) for v in value]
+    return value
+
+class MongoPersistence(BasePersistence):
+    """
+    Stores context.user_data and context.chat_data in Mongo.
+
+    Nothing is loaded at startup: each user/chat is fetched the first time an
+    update for it is processed (refresh_*_data). Changes are buffered and
+    written in one bulk_write per persistence cycle.
+
+    Only private chats hold data (the UI lives there), so group chats are
+    never loaded, and users known to have nothing stored are not read again.
+    """
+
+    def __init__(self, update_interval: float = PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._loaded = set()      # (kind, id) fetched from Mongo this run
+        self._written = {}        # (kind, id) -> last stored encoded data
+        self._last_seen = {}      # (kind, id) -> monotonic time of last update
+        self._pending = {}        # (kind, id) -> encoded data waiting for flush
+        self._empty = set()       # (kind, id) with nothing stored, e.g. group members
+        self._flush_scheduled = False
+
+    # -- startup: lazy, so return nothing --------------------------------
+
+    async def get_user_data(self):
+        return {}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {}
+
+    # -- lazy loading ------------------------------------------------------
+
+    def _load(self, kind, key_id, data):
+        key = (kind, key_id)
+        now = time.monotonic()
+        last_seen = self._last_seen.get(key)
+        self._last_seen[key] = now
+
+        if key not in self._loaded:
+            self._loaded.add(key)
+            if key in self._empty:
+                self._written[key] = {}
+                return
+            doc = persistence_collection.find_one({"_id": f"{kind}:{key_id}"})
+            if not doc:
+                self._empty.add(key)
+            stored = doc.get("data", {}) if doc else {}
+            self._written[key] = stored
+            # Never clobber anything a handler already put in memory
+            for k, v in decode_data(stored).items():
+                data.setdefault(k, v)
+        elif kind == USER and last_seen and now - last_seen > SESSION_TTL:
+            # Abandoned UI session
+            for k in SESSION_KEYS:
+                data.pop(k, None)
+
+    async def refresh_user_data(self, user_id, user_data):
+        self._load(USER, user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        if chat_id < 0:
+            # Groups and channels: every message would cost a read for nothing
+            return
+        self._load(CHAT, chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    # -- write-behind ------------------------------------------------------
+
+    def _buffer(self, kind, key_id, data):
+        key = (kind, key_id)
+        if key not in self._loaded:
+            # Evicted or never loaded - writing now would wipe the stored copy
+            return
+        encoded = encode_data(data)
+        if self._written.get(key, {}) == encoded:
+            return
+        self._pending[key] = encoded
+        self._empty.discard(key)
+
+        if not self._flush_scheduled:
+            # PTB gathers all update_* calls of a cycle; flush once they're done
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush_pending)
+
+    def _flush_pending(self):
+        self._flush_scheduled = False
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        now = datetime.utcnow()
+        ops = []
+        for (kind, key_id), data in pending.items():
+            doc = {"kind": kind, "key_id": key_id, "data": data, "updated_at": now}
+            if kind == USER:
+                doc["expires_at"] = now + timedelta(seconds=SESSION_TTL)
+            ops.append(ReplaceOne({"_id": f"{kind}:{key_id}"}, doc, upsert=True))
+
+        try:
+            persistence_collection.bulk_write(ops, ordered=False)
+            self._written.update(pending)
+        except Exception as e:
+            print(f"[Persistence] Failed to flush {len(ops)} entries: {e}")
+            # Keep newer data if it arrived meanwhile
+            for key, data in pending.items():
+                self._pending.setdefault(key, data)
+
+    async def update_user_data(self, user_id, data):
+        self._buffer(USER, user_id, data)
+
+    async def update_chat_data(self, chat_id, data):
+        self._buffer(CHAT, chat_id, data)
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def drop_user_data(self, user_id):
+        self._drop(USER, user_id)
+
+    async def drop_chat_data(self, chat_id):
+        self._drop(CHAT, chat_id)
+
+    def _drop(self, kind, key_id):
+        key = (kind, key_id)
+        self._pending.pop(key, None)
+        self._written.pop(key, None)
+        self._loaded.discard(key)
+        self._last_seen.pop(key, None)
+        self._empty.add(key)
+        persistence_collection.delete_one({"_id": f"{kind}:{key_id}"})
+
+    async def flush(self):
+        self._flush_pending()
+
+    # -- memory bound ------------------------------------------------------
+
+    def evict_idle(self, application):
+        """Drop in-memory data of users/chats we haven't seen in a while"""
+        self._flush_pending()
+        cutoff = time.monotonic() - IDLE_EVICT_SECONDS
+        idle = [key for key, seen in self._last_seen.items() if seen < cutoff]
+
+        for kind, key_id in idle:
+            # application.drop_*_data would also delete the stored copy, so the
+            # entry is removed from PTB's backing dict directly; it is recreated
+            # empty and reloaded by refresh_*_data on the next update
+            store = application._user_data if kind == USER else application._chat_data
+            store.pop(key_id, None)
+            key = (kind, key_id)
+            self._loaded.discard(key)
+            self._written.pop(key, None)
+            self._last_seen.pop(key, None)
+
+        if idle:
+            print(f"[Persistence] Evicted {len(idle)} idle users/chats from memory")
+
+async def evict_idle_persistence(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback keeping persisted user/chat data memory bounded"""
+    persistence = context.application.persistence
+    if isinstance(persistence, MongoPersistence):
+        persistence.evict_idle(context.application)
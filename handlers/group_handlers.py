@@ -1,6 +1,13 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from database.connection import get_db
+from services.chat_info import get_chat_cached, invalidate_chat
+from services.dashboard_cache import invalidate_dashboard, invalidate_all_dashboards
+from services.membership import record_membership, is_active_member
+from services.rate_limiter import BACKGROUND
+from services.migration import migrate_group
+from services.keyword_index import index_subscribe_user, index_unsubscribe_user, drop_group_index
+from pymongo import ReturnDocument
 import hashlib
 from collections import defaultdict
 from datetime import datetime
@@ -25,6 +32,11 @@ def get_group_display_name(group_id, group_name, all_groups):
         else:
             return f"{group_name} (#{group_index + 1})"
 
+async def handle_chat_member_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Someone joined/left/was banned (needs the bot to be an admin to be sent)"""
+    change = update.chat_member
+    record_membership(change.chat.id, change.new_chat_member.user.id, is_active_member(change.new_chat_member))
+
 async def bot_added(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle bot being added to group"""
     member = update.my_chat_member
@@ -39,7 +51,8 @@ async def bot_added(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not existing:
             await cleanup_potential_migration_duplicates(group_name, group_id, context)
             # Immediately fetch latest chat info for accurate privacy
-            chat_info = await context.bot.get_chat(group_id)
+            # (bypass the cache - a stale "inaccessible" entry may exist)
+            chat_info = await get_chat_cached(context.bot, group_id, refresh=True)
             group_collection.insert_one({
                 "group_id": group_id,
                 "group_name": chat_info.title,
@@ -51,7 +64,7 @@ async def bot_added(update: Update, context: ContextTypes.DEFAULT_TYPE):
             print(f"Bot added to new group: {group_name} ({group_id})")
         else:
             # Update existing group info in case of re-addition
-            chat_info = await context.bot.get_chat(group_id)
+            chat_info = await get_chat_cached(context.bot, group_id, refresh=True)
             group_collection.update_one(
                 {"group_id": group_id},
                 {"$set": {
@@ -66,9 +79,12 @@ async def bot_added(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif member.new_chat_member.status in ["left", "kicked"]:
         # Bot was removed from group - clean up
         print(f"Bot removed from group: {group_name} ({group_id})")
+        invalidate_chat(group_id)
         
         group_collection.delete_one({"group_id": group_id})
         result = subscription_collection.delete_many({"group_id": group_id})
+        drop_group_index(group_id)
+        invalidate_all_dashboards()
         print(f"Cleaned up {result.deleted_count} subscriptions for removed group")
 
 # ENHANCED: Migration handler with better detection
@@ -80,45 +96,24 @@ async def handle_migration(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         print(f"Group migration detected: {old_id} -> {new_id}")
 
-        # Get old group data
-        old_group = group_collection.find_one({"group_id": old_id})
-        if old_group:
-            # Check if new group already exists (shouldn't happen but safety check)
-            existing_new = group_collection.find_one({"group_id": new_id})
-            if existing_new:
-                print(f"New group {new_id} already exists - merging data")
-                # Merge subscription data and remove old group
-                subscription_collection.update_many(
-                    {"group_id": old_id},
-                    {"$set": {"group_id": new_id}}
-                )
-                group_collection.delete_one({"group_id": old_id})
-                return
-
-            # Fetch latest chat info for new group
-            chat_info = await context.bot.get_chat(new_id)
-            new_group_data = old_group.copy()
-            new_group_data["group_id"] = new_id
-            new_group_data["group_name"] = chat_info.title
-            new_group_data["chat_type"] = chat_info.type
-            new_group_data["is_private"] = chat_info.username is None
-            new_group_data["migrated_from"] = old_id
-            new_group_data["migrated_at"] = datetime.utcnow()
-            new_group_data["last_updated"] = datetime.utcnow()
-
-            # Insert new group
-            group_collection.insert_one(new_group_data)
-
-            # Update all user subscriptions
-            result = subscription_collection.update_many(
-                {"group_id": old_id},
-                {"$set": {"group_id": new_id}}
-            )
-
-            # Delete old group record
-            group_collection.delete_one({"group_id": old_id})
+        # Carry the old group record over unless the new one is already known
+        new_group = None
+        old_group = group_collection.find_one({"group_id": old_id}, {"_id": 0})
+        if old_group and not group_collection.find_one({"group_id": new_id}, {"_id": 1}):
+            chat_info = await get_chat_cached(context.bot, new_id)
+            new_group = {
+                **old_group,
+                "group_name": chat_info.title,
+                "chat_type": chat_info.type,
+                "is_private": chat_info.username is None,
+                "migrated_from": old_id,
+                "migrated_at": datetime.utcnow(),
+            }
+        elif old_group:
+            print(f"New group {new_id} already exists - merging data")
 
-            print(f"Migration completed: Updated {result.modified_count} subscriptions")
+        kept = migrate_group([old_id], new_id, new_group)
+        print(f"Migration completed: {kept} subscriptions now in {new_id}")
 
 # NEW: Periodic health check to catch missed updates
 async def periodic_group_health_check(context: ContextTypes.DEFAULT_TYPE):
@@ -134,8 +129,8 @@ async def periodic_group_health_check(context: ContextTypes.DEFAULT_TYPE):
         group_id = group["group_id"]
         
         try:
-            # Try to get current chat info
-            chat_info = await context.bot.get_chat(group_id)
+            # Try to get current chat info (cached, shared with other call sites)
+            chat_info = await get_chat_cached(context.bot, group_id, lane=BACKGROUND)
             
             # Check if group info needs updating
             updates = {}
@@ -163,6 +158,7 @@ async def periodic_group_health_check(context: ContextTypes.DEFAULT_TYPE):
                         {"group_id": group_id},
                         {"$set": {"group_name": updates["group_name"]}}
                     )
+                    invalidate_all_dashboards()
                 
                 updated_count += 1
                 print(f"Health check updated group {group_id}: {updates}")
@@ -173,6 +169,8 @@ async def periodic_group_health_check(context: ContextTypes.DEFAULT_TYPE):
             
             group_collection.delete_one({"group_id": group_id})
             result = subscription_collection.delete_many({"group_id": group_id})
+            drop_group_index(group_id)
+            invalidate_all_dashboards()
             removed_count += 1
             
             print(f"Removed orphaned group and {result.deleted_count} subscriptions")
@@ -186,7 +184,7 @@ async def periodic_group_health_check(context: ContextTypes.DEFAULT_TYPE):
 async def force_refresh_group(group_id: int, context: ContextTypes.DEFAULT_TYPE):
     """Force refresh a single group's information"""
     try:
-        chat_info = await context.bot.get_chat(group_id)
+        chat_info = await get_chat_cached(context.bot, group_id, refresh=True)
         
         updates = {
             "group_name": chat_info.title,
@@ -206,6 +204,7 @@ async def force_refresh_group(group_id: int, context: ContextTypes.DEFAULT_TYPE)
             {"group_id": group_id},
             {"$set": {"group_name": updates["group_name"]}}
         )
+        invalidate_all_dashboards()
         
         print(f"Force refreshed group {group_id}")
         return True
@@ -233,23 +232,17 @@ async def cleanup_potential_migration_duplicates(group_name, new_group_id, conte
                 continue
             
             try:
-                chat_info = await context.bot.get_chat(old_group_id)
+                chat_info = await get_chat_cached(context.bot, old_group_id)
                 print(f"Group {old_group_id} is still accessible")
             except Exception as e:
                 print(f"Group {old_group_id} is no longer accessible: {e}")
                 groups_to_remove.append(old_group_id)
         
-        # Remove inaccessible groups and transfer their subscriptions
-        for old_group_id in groups_to_remove:
-            print(f"Migrating subscriptions from {old_group_id} to {new_group_id}")
-            
-            subscription_collection.update_many(
-                {"group_id": old_group_id},
-                {"$set": {"group_id": new_group_id}}
-            )
-            
-            group_collection.delete_one({"group_id": old_group_id})
-            print(f"Removed orphaned group {old_group_id}")
+        # Move subscriptions of inaccessible groups over in one merge
+        if groups_to_remove:
+            print(f"Migrating subscriptions from {groups_to_remove} to {new_group_id}")
+            migrate_group(groups_to_remove, new_group_id)
+            print(f"Removed orphaned groups {groups_to_remove}")
 
 # Rest of your existing code (list_groups, group_detail, etc.) remains the same...
 GROUPS_PER_PAGE = 5
@@ -454,22 +447,33 @@ async def handle_group_actions(update: Update, context: ContextTypes.DEFAULT_TYP
             },
             upsert=True
         )
+        index_subscribe_user(group_id, user_id, keywords)
+        invalidate_dashboard(user_id)
         await query.answer("🔔 Notifications enabled!")
         await group_detail(update, context)
 
     elif data.startswith("mute_"):
         group_id = int(data.split("_")[1])
-        subscription_collection.update_one(
+        previous = subscription_collection.find_one_and_update(
             {"user_id": user_id, "group_id": group_id},
-            {"$set": {"subscribed": False}}
+            {"$set": {"subscribed": False}},
+            projection={"keywords": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        if previous:
+            index_unsubscribe_user(group_id, user_id, previous.get("keywords", []))
+        invalidate_dashboard(user_id)
         await query.answer("🔇 Notifications muted")
         await group_detail(update, context)
 
     elif data.startswith("leave_"):
         group_id = int(data.split("_")[1])
-        subscription_collection.delete_one(
-            {"user_id": user_id, "group_id": group_id}
+        previous = subscription_collection.find_one_and_delete(
+            {"user_id": user_id, "group_id": group_id},
+            projection={"keywords": 1}
         )
+        if previous:
+            index_unsubscribe_user(group_id, user_id, previous.get("keywords", []))
+        invalidate_dashboard(user_id)
         await query.answer("🚪 Left group")
         await list_groups(update, context)
\ No newline at end of file
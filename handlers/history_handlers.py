@@ -0,0 +1,125 @@
+import re
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
+from database.connection import get_db
+from services.history import find_history_page, HISTORY_RETENTION_DAYS
+from services.matcher import normalize_keyword
+
+db = get_db()
+subscription_collection = db["user_subscriptions"]
+
+FILTER_PATTERN = re.compile(r"(group|keyword)\s*=\s*", re.IGNORECASE)
+EXCERPT_PREVIEW = 120
+
+HISTORY_USAGE = (
+    "`/history` – your latest matches\n"
+    "`/history group=<name or id>` – only one group\n"
+    "`/history keyword=<keyword>` – only one keyword"
+)
+
+def parse_history_filters(text: str):
+    """'group=My Group keyword=python' -> {"group": "My Group", "keyword": "python"}"""
+    parts = FILTER_PATTERN.split(text)
+    filters = {}
+    # parts: [leading text, name, value, name, value, ...]
+    for name, value in zip(parts[1::2], parts[2::2]):
+        filters[name.lower()] = value.strip()
+    return filters
+
+def resolve_group(user_id: int, ref: str):
+    """Group id for a group name or id among the user's subscriptions"""
+    subs = list(subscription_collection.find({"user_id": user_id}, {"_id": 0, "group_id": 1, "group_name": 1}))
+    for sub in subs:
+        if str(sub["group_id"]) == ref or str(sub.get("group_name", "")).lower() == ref.lower():
+            return sub["group_id"]
+    return None
+
+def render_history_entry(entry):
+    keywords = ", ".join(f"`{kw}`" for kw in entry["keywords"])
+    excerpt = entry.get("excerpt", "")
+    if len(excerpt) > EXCERPT_PREVIEW:
+        excerpt = excerpt[:EXCERPT_PREVIEW] + "…"
+    line = (
+        f"🕒 `{entry['ts'].strftime('%Y-%m-%d %H:%M')}` · *{escape_markdown(entry.get('group_name', ''))}* · {keywords}\n"
+        f"{escape_markdown(excerpt)}"
+    )
+    if entry.get("link"):
+        line += f" [View]({entry['link']})"
+    return line
+
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    filters = parse_history_filters(" ".join(context.args or []))
+
+    history_filter = {}
+    if filters.get("group"):
+        group_id = resolve_group(user_id, filters["group"])
+        if group_id is None:
+            await update.message.reply_text(
+                f"❌ No group called '{escape_markdown(filters['group'])}' in your groups.\n\n{HISTORY_USAGE}",
+                parse_mode="Markdown"
+            )
+            return
+        history_filter["group_id"] = group_id
+    if filters.get("keyword"):
+        history_filter["keyword"] = normalize_keyword(filters["keyword"])
+
+    # Fresh /history always starts on the newest page
+    context.user_data["history_filter"] = history_filter
+    context.user_data["history_page"] = 0
+    context.user_data["history_page_keys"] = [None]
+    await show_history_page(update, context)
+
+async def show_history_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    history_filter = context.user_data.get("history_filter", {})
+    page = context.user_data.get("history_page", 0)
+    page_keys = context.user_data.setdefault("history_page_keys", [None])
+    if page >= len(page_keys):
+        page = context.user_data["history_page"] = 0
+
+    entries, next_key = find_history_page(
+        user_id, page_keys[page],
+        group_id=history_filter.get("group_id"),
+        keyword=history_filter.get("keyword"),
+    )
+
+    if not entries and page == 0:
+        text = f"📭 No matches in the last {HISTORY_RETENTION_DAYS} days.\n\n{HISTORY_USAGE}"
+    else:
+        header = f"🗂 *Match history* (page {page + 1}, times in UTC)"
+        text = "\n\n".join([header] + [render_history_entry(entry) for entry in entries])
+
+    # Remember where the next page starts (range key, not an offset)
+    if next_key is not None:
+        del page_keys[page + 1:]
+        page_keys.append(next_key)
+
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("⬅️ Newer", callback_data="histpage_prev"))
+    if next_key is not None:
+        buttons.append(InlineKeyboardButton("➡️ Older", callback_data="histpage_next"))
+    reply_markup = InlineKeyboardMarkup([buttons]) if buttons else None
+
+    if update.callback_query:
+        await update.callback_query.edit_message_text(
+            text, parse_mode="Markdown", reply_markup=reply_markup, disable_web_page_preview=True
+        )
+    else:
+        await update.message.reply_text(
+            text, parse_mode="Markdown", reply_markup=reply_markup, disable_web_page_preview=True
+        )
+
+async def handle_history_page_nav(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    page = context.user_data.get("history_page", 0)
+    if query.data == "histpage_next":
+        context.user_data["history_page"] = page + 1
+    elif query.data == "histpage_prev" and page > 0:
+        context.user_data["history_page"] = page - 1
+
+    await show_history_page(update, context)
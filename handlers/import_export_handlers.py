@@ -0,0 +1,253 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from telegram import Update
+from telegram.ext import ContextTypes
+from pymongo import UpdateOne
+from database.connection import get_db
+from handlers.keyword_handlers import MAX_KEYWORDS_PER_GROUP
+from services.dashboard_cache import invalidate_dashboard
+from services.keyword_index import index_apply_bulk, index_global_keywords_changed
+from services.global_keywords import (
+    GLOBAL_SCOPE, GLOBAL_SCOPE_NAME, MAX_GLOBAL_KEYWORDS, get_global_keywords, add_global_keywords
+)
+from services.matcher import normalize_keyword, validate_keyword
+
+db = get_db()
+subscription_collection = db["user_subscriptions"]
+
+MAX_IMPORT_BYTES = 1024 * 1024
+EXPORT_FIELDS = ["group_id", "group_name", "keyword"]
+
+IMPORT_HELP = (
+    "📥 *Import keywords*\n\n"
+    "Send me a `.csv` or `.json` file now.\n\n"
+    "*CSV* – one keyword per row:\n"
+    "`group_id,group_name,keyword`\n"
+    "(either the group id or the group name is enough; use `global` for keywords that apply to all groups)\n\n"
+    "*JSON* – group name or id mapped to keywords:\n"
+    "`{\"My Group\": [\"python\", \"remote\"]}`\n\n"
+    "Tip: /export gives you a file in the same format."
+)
+
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data["awaiting_import"] = True
+    await update.message.reply_text(IMPORT_HELP, parse_mode="Markdown")
+
+def iter_csv_rows(stream):
+    """Yield (group_ref, keyword) from a CSV export, or from plain `group,keyword` rows"""
+    reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    header = None
+    for row in reader:
+        row = [cell.strip() for cell in row]
+        if not any(row):
+            continue
+        if header is None and "keyword" in [cell.lower() for cell in row]:
+            header = [cell.lower() for cell in row]
+            continue
+
+        if header:
+            record = dict(zip(header, row))
+            group_ref = record.get("group_id") or record.get("group_name") or record.get("group")
+            yield group_ref, record.get("keyword", "")
+        elif len(row) >= 2:
+            # group,keyword[,keyword...]
+            for keyword in row[1:]:
+                yield row[0], keyword
+
+def json_keyword_list(keywords):
+    """Keywords of one JSON group entry: a list, or a comma separated string"""
+    if isinstance(keywords, str):
+        return keywords.split(",")
+    if not isinstance(keywords, list):
+        raise ValueError("keywords must be a list or a string")
+    return keywords
+
+def iter_json_rows(stream):
+    """Yield (group_ref, keyword) from our JSON export or a {group: [keywords]} mapping"""
+    data = json.load(io.TextIOWrapper(stream, encoding="utf-8-sig"))
+    if isinstance(data, dict) and isinstance(data.get("groups"), list):
+        for keyword in json_keyword_list(data.get(GLOBAL_SCOPE, [])):
+            yield GLOBAL_SCOPE, keyword
+        for group in data["groups"]:
+            if not isinstance(group, dict):
+                raise ValueError("entries in groups must be objects")
+            group_ref = group.get("group_id") or group.get("group_name")
+            for keyword in json_keyword_list(group.get("keywords", [])):
+                yield group_ref, keyword
+    elif isinstance(data, dict):
+        for group_ref, keywords in data.items():
+            for keyword in json_keyword_list(keywords):
+                yield group_ref, keyword
+    else:
+        raise ValueError("JSON must be an object")
+
+def plan_import(rows, subscriptions, global_keywords=()):
+    """
+    Validate and deduplicate imported rows against the user's subscriptions.
+    Returns ({group_id or GLOBAL_SCOPE: [new keywords]}, skipped counters).
+    """
+    global_scope = {"group_id": GLOBAL_SCOPE, "group_name": GLOBAL_SCOPE_NAME, "keywords": list(global_keywords)}
+    subscriptions = list(subscriptions) + [global_scope]
+    by_id = {str(sub["group_id"]): sub for sub in subscriptions}
+    by_name = {}
+    for sub in subscriptions:
+        by_name.setdefault(str(sub.get("group_name", "")).lower(), sub)
+
+    additions = defaultdict(list)
+    seen = {sub["group_id"]: set(sub.get("keywords", [])) for sub in subscriptions}
+    skipped = defaultdict(int)
+
+    for group_ref, keyword in rows:
+        group_ref = str(group_ref or "").strip()
+        sub = by_id.get(group_ref) or by_name.get(group_ref.lower())
+        if not sub:
+            skipped["unknown group"] += 1
+            continue
+
+        if not isinstance(keyword, str):
+            # Numbers, objects... in a JSON file are not keywords
+            skipped["invalid keyword"] += 1
+            continue
+        keyword = normalize_keyword(keyword)
+        if validate_keyword(keyword):
+            skipped["invalid keyword"] += 1
+            continue
+
+        group_id = sub["group_id"]
+        if keyword in seen[group_id]:
+            skipped["duplicate"] += 1
+            continue
+        limit = MAX_GLOBAL_KEYWORDS if group_id == GLOBAL_SCOPE else MAX_KEYWORDS_PER_GROUP
+        if len(seen[group_id]) >= limit:
+            skipped["group limit reached"] += 1
+            continue
+
+        seen[group_id].add(keyword)
+        additions[group_id].append(keyword)
+
+    return additions, skipped
+
+async def handle_import_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = update.message
+    caption = (message.caption or "").strip().lower()
+    if not context.user_data.pop("awaiting_import", False) and not caption.startswith("/import"):
+        return
+
+    user_id = update.effective_user.id
+    document = message.document
+    file_name = (document.file_name or "").lower()
+
+    if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+        await message.reply_text(f"🚫 File too large (max {MAX_IMPORT_BYTES // 1024} KB).")
+        return
+
+    subscriptions = list(subscription_collection.find(
+        {"user_id": user_id, "subscribed": True},
+        {"_id": 0, "group_id": 1, "group_name": 1, "keywords": 1}
+    ))
+    if not subscriptions:
+        await message.reply_text("❗️ You are not subscribed to any group yet. Use /groups first.")
+        return
+
+    stream = io.BytesIO()
+    telegram_file = await document.get_file()
+    await telegram_file.download_to_memory(stream)
+    stream.seek(0)
+
+    try:
+        if file_name.endswith(".json") or document.mime_type == "application/json":
+            rows = iter_json_rows(stream)
+        else:
+            rows = iter_csv_rows(stream)
+        additions, skipped = plan_import(rows, subscriptions, get_global_keywords(user_id))
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        await message.reply_text(f"❌ Could not read the file: {e}")
+        return
+
+    global_additions = additions.pop(GLOBAL_SCOPE, None)
+    if global_additions:
+        add_global_keywords(user_id, global_additions)
+        index_global_keywords_changed(user_id)
+
+    if additions:
+        # One round trip for the whole import
+        subscription_collection.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "group_id": group_id},
+                {"$addToSet": {"keywords": {"$each": keywords}}}
+            )
+            for group_id, keywords in additions.items()
+        ], ordered=False)
+        index_apply_bulk([
+            ("add", group_id, user_id, keywords)
+            for group_id, keywords in additions.items()
+        ])
+
+    if global_additions:
+        additions = {GLOBAL_SCOPE: global_additions, **additions}
+    if additions:
+        invalidate_dashboard(user_id)
+
+    names = {sub["group_id"]: sub.get("group_name", f"Group {sub['group_id']}") for sub in subscriptions}
+    names[GLOBAL_SCOPE] = GLOBAL_SCOPE_NAME
+    response = ["📥 *Import finished*"]
+    total = sum(len(keywords) for keywords in additions.values())
+    response.append(f"✅ Added {total} keywords")
+    for group_id, keywords in additions.items():
+        response.append(f"• {names[group_id]}: {len(keywords)}")
+    if skipped:
+        response.append("\n⚠️ Skipped: " + ", ".join(f"{count} {reason}" for reason, count in skipped.items()))
+
+    await message.reply_text("\n".join(response), parse_mode="Markdown")
+
+def write_export(subscriptions, as_json=False, global_keywords=()):
+    """Stream subscriptions (a cursor) into an in-memory file"""
+    buffer = io.BytesIO()
+    text = io.TextIOWrapper(buffer, encoding="utf-8", newline="", write_through=True)
+
+    if as_json:
+        text.write('{"%s": %s,\n"groups": [' % (GLOBAL_SCOPE, json.dumps(list(global_keywords), ensure_ascii=False)))
+        for i, sub in enumerate(subscriptions):
+            entry = {
+                "group_id": sub["group_id"],
+                "group_name": sub.get("group_name"),
+                "keywords": sub.get("keywords", []),
+            }
+            text.write(("," if i else "") + "\n  " + json.dumps(entry, ensure_ascii=False))
+        text.write("\n]}\n")
+    else:
+        writer = csv.writer(text)
+        writer.writerow(EXPORT_FIELDS)
+        for keyword in global_keywords:
+            writer.writerow([GLOBAL_SCOPE, GLOBAL_SCOPE_NAME, keyword])
+        for sub in subscriptions:
+            for keyword in sub.get("keywords", []):
+                writer.writerow([sub["group_id"], sub.get("group_name", ""), keyword])
+
+    text.detach()
+    buffer.seek(0)
+    return buffer
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    as_json = bool(context.args) and context.args[0].lower() == "json"
+
+    # Same groups /import accepts, so an export can be imported back as is
+    cursor = subscription_collection.find(
+        {"user_id": user_id, "subscribed": True},
+        {"_id": 0, "group_id": 1, "group_name": 1, "keywords": 1}
+    ).sort([("group_name", 1), ("group_id", 1)])
+
+    buffer = write_export(cursor, as_json=as_json, global_keywords=get_global_keywords(user_id))
+    if buffer.getbuffer().nbytes <= len(",".join(EXPORT_FIELDS)) + 2 and not as_json:
+        await update.message.reply_text("ℹ️ You don't have any keywords to export.")
+        return
+
+    file_name = "pingyou_keywords.json" if as_json else "pingyou_keywords.csv"
+    await update.message.reply_document(
+        document=buffer,
+        filename=file_name,
+        caption="📤 Your keywords. Edit and send back with /import."
+    )
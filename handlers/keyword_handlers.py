@@ -1,11 +1,34 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from database.connection import get_db
+from services.dashboard_cache import invalidate_dashboard
+from services.keyword_index import index_add_keywords, index_remove_keywords, index_global_keywords_changed
+from services.global_keywords import (
+    GLOBAL_SCOPE, GLOBAL_SCOPE_NAME, MAX_GLOBAL_KEYWORDS,
+    get_global_keywords, add_global_keywords, remove_global_keywords, clear_global_keywords
+)
+from services.matcher import normalize_keyword, validate_keyword
+from pymongo import ReturnDocument
 
 db = get_db()
 subscription_collection = db["user_subscriptions"]
 group_collection = db["bot_groups"]
 
+def get_keyword_scope(user_id, group_id):
+    """
+    Subscription-like dict for the selected /use target: a group's
+    subscription, or the user's global keywords when GLOBAL_SCOPE is selected.
+    """
+    if group_id == GLOBAL_SCOPE:
+        return {"subscribed": True, "keywords": get_global_keywords(user_id)}
+    return subscription_collection.find_one({"user_id": user_id, "group_id": group_id})
+
+def get_scope_name(group_id):
+    if group_id == GLOBAL_SCOPE:
+        return GLOBAL_SCOPE_NAME
+    group = group_collection.find_one({"group_id": group_id})
+    return group.get("group_name", f"Group {group_id}") if group else f"Group {group_id}"
+
 async def use_group(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     user_subs = list(subscription_collection.find({"user_id": user_id, "subscribed": True}))
@@ -18,6 +41,8 @@ async def use_group(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton(sub["group_name"], callback_data=f"use|{sub['group_id']}")]
         for sub in user_subs
     ]
+    # Global keywords apply to every subscribed group
+    buttons.append([InlineKeyboardButton(GLOBAL_SCOPE_NAME, callback_data=f"use|{GLOBAL_SCOPE}")])
     keyboard = InlineKeyboardMarkup(buttons)
     await update.message.reply_text("Select a group to manage keywords:", reply_markup=keyboard)
 
@@ -28,6 +53,15 @@ async def handle_use_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     data = query.data
     parts = data.split("|")
     
+    if len(parts) == 2 and parts[1] == GLOBAL_SCOPE:
+        context.chat_data["active_group"] = GLOBAL_SCOPE
+        context.chat_data["active_group_name"] = GLOBAL_SCOPE_NAME
+        await query.edit_message_text(
+            "✅ Managing *global keywords* – they apply to all groups you're tracking.",
+            parse_mode="Markdown"
+        )
+        return
+
     if len(parts) == 3:  # New format with group_name
         action, group_id, group_name = parts
     elif len(parts) == 2:  # Old format for backward compatibility
@@ -47,6 +81,7 @@ async def handle_use_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 MAX_KEYWORDS_PER_ADD = 20
 MAX_KEYWORDS_PER_GROUP = 50
+EMPTY_KEYWORD = '""'
 
 async def add_keyword(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
@@ -56,7 +91,7 @@ async def add_keyword(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     group_id = context.chat_data["active_group"]
-    sub = subscription_collection.find_one({"user_id": user_id, "group_id": group_id})
+    sub = get_keyword_scope(user_id, group_id)
 
     if not sub or not sub.get("subscribed", False):
         await update.message.reply_text("❗️ You are not subscribed to this group.")
@@ -64,22 +99,31 @@ async def add_keyword(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if not context.args:
         await update.message.reply_text(
-            "✏️ Please enter keywords after the command. Example:\n`/add python, ai, remote`",
+            "✏️ Please enter keywords after the command. Example:\n`/add python, ai, remote`\n\n"
+            "Add `~` to also catch typos: `/add internship~` (1 typo) or `/add javascript~2` (2 typos)\n"
+            "Combine words with AND / NOT: `/add python AND remote NOT senior`",
             parse_mode="Markdown"
         )
         return
 
     # Parse and normalize
     input_text = " ".join(context.args)
-    input_keywords = [kw.strip().lower() for kw in input_text.split(",") if kw.strip()]
+    input_keywords = [normalize_keyword(kw) for kw in input_text.split(",") if kw.strip()]
     input_keywords = list(set(input_keywords))  # deduplicate input
 
+    invalid = [(kw, validate_keyword(kw)) for kw in input_keywords if validate_keyword(kw)]
+    if invalid:
+        details = "\n".join(f"• `{kw or EMPTY_KEYWORD}` – {reason}" for kw, reason in invalid)
+        await update.message.reply_text(f"🚫 Invalid keywords:\n{details}", parse_mode="Markdown")
+        return
+
     if len(input_keywords) > MAX_KEYWORDS_PER_ADD:
         await update.message.reply_text(f"🚫 You can add a maximum of {MAX_KEYWORDS_PER_ADD} keywords at once.")
         return
 
     existing_keywords = sub.get("keywords", [])
-    remaining_slots = MAX_KEYWORDS_PER_GROUP - len(existing_keywords)
+    max_keywords = MAX_GLOBAL_KEYWORDS if group_id == GLOBAL_SCOPE else MAX_KEYWORDS_PER_GROUP
+    remaining_slots = max_keywords - len(existing_keywords)
 
     # Filter out duplicates
     added_keywords = [kw for kw in input_keywords if kw not in existing_keywords][:remaining_slots]
@@ -90,17 +134,22 @@ async def add_keyword(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Save
-    subscription_collection.update_one(
-        {"user_id": user_id, "group_id": group_id},
-        {"$push": {"keywords": {"$each": added_keywords}}}
-    )
+    if group_id == GLOBAL_SCOPE:
+        add_global_keywords(user_id, added_keywords)
+        index_global_keywords_changed(user_id)
+    else:
+        subscription_collection.update_one(
+            {"user_id": user_id, "group_id": group_id},
+            {"$push": {"keywords": {"$each": added_keywords}}}
+        )
+        index_add_keywords(group_id, user_id, added_keywords)
+    invalidate_dashboard(user_id)
 
     # Build response
     response = []
 
     # Add group name info at the top
-    group = group_collection.find_one({"group_id": group_id})
-    group_name = group.get("group_name", f"Group {group_id}") if group else f"Group {group_id}"
+    group_name = get_scope_name(group_id)
     response.append(f"📌 *Group:* {group_name}")
 
     if added_keywords:
@@ -122,17 +171,25 @@ async def list_keywords(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     group_id = context.chat_data["active_group"]
-    sub = subscription_collection.find_one({"user_id": user_id, "group_id": group_id})
+    sub = get_keyword_scope(user_id, group_id)
 
     if not sub or not sub.get("subscribed", False):
         await update.message.reply_text("❗️ You are not subscribed to this group.")
         return
 
     keywords = sub.get("keywords", [])
-    if not keywords:
+    lines = [f"• {kw}" for kw in keywords]
+
+    if group_id != GLOBAL_SCOPE:
+        global_keywords = get_global_keywords(user_id)
+        if global_keywords:
+            lines.append(f"\n{GLOBAL_SCOPE_NAME} (also apply here):")
+            lines += [f"• {kw}" for kw in global_keywords]
+
+    if not lines:
         await update.message.reply_text("No keywords found.")
     else:
-        await update.message.reply_text("\n".join(f"• {kw}" for kw in keywords))
+        await update.message.reply_text("\n".join(lines))
 
 KEYWORDS_PER_PAGE = 10  # You can tweak this value
 
@@ -143,7 +200,7 @@ async def remove_keyword(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     group_id = context.chat_data["active_group"]
-    sub = subscription_collection.find_one({"user_id": user_id, "group_id": group_id})
+    sub = get_keyword_scope(user_id, group_id)
 
     if not sub or not sub.get("subscribed", False):
         await update.message.reply_text("❗️ You are not subscribed to this group.")
@@ -171,17 +228,17 @@ async def show_remove_menu(update, context):
     group_id = data.get("group_id")
     page = data.get("page", 0)
 
-    group = group_collection.find_one({"group_id": group_id})
-    group_name = group.get("group_name", f"Group {group_id}") if group else f"Group {group_id}"
+    group_name = get_scope_name(group_id)
 
     start = page * KEYWORDS_PER_PAGE
     end = start + KEYWORDS_PER_PAGE
     paginated_keywords = all_keywords[start:end]
 
     keyboard = []
-    for kw in paginated_keywords:
+    # Keywords can be longer than the 64-byte callback_data limit; send their position
+    for i, kw in enumerate(paginated_keywords, start):
         emoji = "✅" if kw in selected else "🔹"
-        keyboard.append([InlineKeyboardButton(f"{emoji} {kw}", callback_data=f"kw_toggle:{kw}")])
+        keyboard.append([InlineKeyboardButton(f"{emoji} {kw}", callback_data=f"kw_toggle:{i}")])
 
     nav_buttons = []
     if start > 0:
@@ -237,7 +294,11 @@ async def handle_remove_callback(update: Update, context: ContextTypes.DEFAULT_T
     data = query.data
 
     if data.startswith("kw_toggle:"):
-        keyword = data.split(":")[1]
+        index = int(data.split(":", 1)[1])
+        if index >= len(session["all_keywords"]):
+            await show_remove_menu(update, context)
+            return
+        keyword = session["all_keywords"][index]
         if keyword in session["selected"]:
             session["selected"].remove(keyword)
         else:
@@ -258,10 +319,16 @@ async def handle_remove_callback(update: Update, context: ContextTypes.DEFAULT_T
             await query.answer("❗ No keywords selected", show_alert=True)
             return
 
-        subscription_collection.update_one(
-            {"user_id": user_id, "group_id": session["group_id"]},
-            {"$pull": {"keywords": {"$in": list(session["selected"])}}}
-        )
+        if session["group_id"] == GLOBAL_SCOPE:
+            remove_global_keywords(user_id, session["selected"])
+            index_global_keywords_changed(user_id)
+        else:
+            subscription_collection.update_one(
+                {"user_id": user_id, "group_id": session["group_id"]},
+                {"$pull": {"keywords": {"$in": list(session["selected"])}}}
+            )
+            index_remove_keywords(session["group_id"], user_id, session["selected"])
+        invalidate_dashboard(user_id)
 
         removed_count = len(session["selected"])
         await query.edit_message_text(
@@ -285,10 +352,19 @@ async def handle_remove_callback(update: Update, context: ContextTypes.DEFAULT_T
         )
 
     elif data == "kw_confirm_remove_all":
-        subscription_collection.update_one(
-            {"user_id": user_id, "group_id": session["group_id"]},
-            {"$set": {"keywords": []}}
-        )
+        if session["group_id"] == GLOBAL_SCOPE:
+            clear_global_keywords(user_id)
+            index_global_keywords_changed(user_id)
+        else:
+            previous = subscription_collection.find_one_and_update(
+                {"user_id": user_id, "group_id": session["group_id"]},
+                {"$set": {"keywords": []}},
+                projection={"keywords": 1},
+                return_document=ReturnDocument.BEFORE
+            )
+            if previous:
+                index_remove_keywords(session["group_id"], user_id, previous.get("keywords", []))
+        invalidate_dashboard(user_id)
         await query.edit_message_text(
             "🧹 All keywords have been removed from this group.",
             parse_mode="Markdown"
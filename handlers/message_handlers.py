@@ -1,7 +1,18 @@
 from datetime import datetime
 from telegram import Update
-from telegram.ext import ContextTypes, filters
+from telegram.ext import ApplicationHandlerStop, ContextTypes, filters
 from database.connection import get_db
+from services.delivery import deliver_notification, SENT, RETRY
+from services.chat_info import invalidate_chat
+from services.dashboard_cache import invalidate_all_dashboards
+from services.keyword_index import get_group_matcher
+from services.sharding import dispatch_to_shard
+from services.match_offload import match_message
+from services.membership import filter_members, record_membership
+from services.history import record_match
+from services.stats import count_message, count_matches
+from services.edit_tracking import notified_messages
+from services.quiet_hours import load_quiet_hours, quiet_window_end, defer_notifications, EXCERPT_LENGTH
 
 db = get_db()
 subscription_collection = db["user_subscriptions"]
@@ -16,9 +27,15 @@ async def handle_group_message(update, context):
     
     # 🔄 STEP 1: Handle real-time metadata updates first
     await handle_real_time_metadata_updates(update, context)
+    track_membership_changes(update)
     
-    # 🔄 STEP 2: Process message for keyword matching
-    await process_keyword_matching(update, context)
+    # 🔄 STEP 2: Process message for keyword matching (in its shard's worker when sharded)
+    if not dispatch_to_shard(update):
+        await process_keyword_matching(update, context)
+
+async def ignore_private_edit(update, context):
+    """Editing a command in private chat must not run it again"""
+    raise ApplicationHandlerStop
 
 async def handle_real_time_metadata_updates(update, context):
     """Handle all real-time group metadata updates"""
@@ -33,6 +50,7 @@ async def handle_real_time_metadata_updates(update, context):
         return
     
     group_id = chat.id
+    invalidate_chat(group_id)
     current_group = group_collection.find_one({"group_id": group_id})
     
     if not current_group:
@@ -88,84 +106,161 @@ async def handle_real_time_metadata_updates(update, context):
                 {"group_id": group_id},
                 {"$set": {"group_name": updates["group_name"]}}
             )
+            invalidate_all_dashboards()
         
         print(f"[RealTime] Updated group {group_id} with: {updates}")
 
 async def process_keyword_matching(update, context):
-    """Process message for keyword matching (existing logic)"""
-    if not update.message or not update.message.text:
+    """Process a new or edited message for keyword matching"""
+    message = update.effective_message
+    if not message or not message.text or not (update.message or update.edited_message):
         return
 
-    message_text = update.message.text.lower()
+    edited = update.edited_message is not None
+    message_text = message.text.lower()
     group_id = update.effective_chat.id
     group_name = update.effective_chat.title or "Unknown Group"
     
-    print(f"🔍 Processing message: '{message_text}'")
+    print(f"🔍 Processing {'edited ' if edited else ''}message: '{message_text}'")
     print(f"📍 Group ID: {group_id}")
     print(f"📍 Group Name: {group_name}")
 
-    # Your existing keyword matching logic here...
-    cursor = subscription_collection.find({"group_id": group_id, "subscribed": True})
-    
-    matched_any = False
-    for doc in cursor:
-        user_id = doc["user_id"]
-        keywords = doc.get("keywords", [])
-        
-        matched_keywords = []
-        for kw in keywords:
-            kw_lower = kw.lower()
-            if kw_lower in message_text:
-                matched_keywords.append(kw)
-
-        if matched_keywords:
-            matched_any = True
-            print(f"🎯 MATCHED KEYWORDS: {matched_keywords} for user {user_id}")
-            
-            try:
-                # Your existing notification logic...
-                highlighted = message_text
-                for kw in matched_keywords:
-                    highlighted = highlighted.replace(kw.lower(), f"*{kw.lower()}*")
-
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                msg_id = update.message.message_id
-
-                if update.effective_chat.username:
-                    message_link = f"https://t.me/{update.effective_chat.username}/{msg_id}"
-                    link_text = f"[View message]({message_link})"
-                else:
-                    link_text = "_Message link unavailable (private group)_"
-
-                sender = update.effective_user
-                sender_name = sender.full_name
-                sender_username = f"(@{sender.username})" if sender.username else ""
-                stored_group_name = doc.get('group_name', group_name)
-
-                msg = (
-                    f"📌 *Keyword Match!*\n"
-                    f"🔍 *Matched:* {', '.join(f'`{kw}`' for kw in matched_keywords)}\n"
-                    f"👤 *Sender:* {sender_name} {sender_username}\n"
-                    f"👥 *Group:* `{stored_group_name}`\n"
-                    f"🕒 *Time:* `{timestamp}`\n"
-                    f"{link_text}\n\n"
-                    f"🗨️ *Message:* {highlighted}"
-                )
+    if edited:
+        already_notified = notified_messages.get(group_id, message.message_id)
+        if already_notified is None:
+            # Not seen recently (older than the cache) - don't risk re-notifying
+            print("✏️ Edit of an untracked message - skipping")
+            return
+    else:
+        already_notified = {}
+        count_message(group_id)
 
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=msg,
-                    parse_mode="Markdown",
-                    disable_web_page_preview=True,
-                )
+    # One cached index document per group: keyword -> subscribed user ids
+    matcher = get_group_matcher(group_id)
+    matches, hits = await match_message(matcher, group_id, message_text)
+
+    # Edits only notify about keywords that weren't matched before
+    if edited:
+        matches = {
+            user_id: [kw for kw in kws if kw not in already_notified.get(user_id, ())]
+            for user_id, kws in matches.items()
+        }
+        matches = {user_id: kws for user_id, kws in matches.items() if kws}
+    # Track the message even without recipients so its edits are recognised
+    notified_messages.remember(group_id, message.message_id, {})
+    if not matches:
+        return
+
+    # Subscriptions outlive membership - only notify people still in the group
+    sender = update.effective_user
+    if sender:
+        record_membership(group_id, sender.id, True, forward=False)
+    members = await filter_members(context.bot, group_id, matches.keys())
+    quiet_hours = load_quiet_hours(members)
+    deferred = []
+    delivered = {}  # user_id -> keywords, sent now or deferred to a digest
+    queued = {}     # user_id -> keywords, in the delivery retry queue
+
+    for user_id, matched_keywords in matches.items():
+        if user_id not in members:
+            print(f"🚪 User {user_id} is no longer in {group_id} - skipping")
+            continue
+
+        release_at = quiet_window_end(quiet_hours[user_id]) if user_id in quiet_hours else None
+        if release_at:
+            # Quiet hours: goes into the user's digest at the end of the window
+            deferred.append({
+                "user_id": user_id,
+                "group_id": group_id,
+                "group_name": group_name,
+                "keywords": matched_keywords,
+                "excerpt": message.text[:EXCERPT_LENGTH + 1],
+                "link": message_link(update),
+                "matched_at": datetime.utcnow(),
+                "release_at": release_at,
+            })
+            delivered[user_id] = matched_keywords
+            continue
+
+        print(f"🎯 MATCHED KEYWORDS: {matched_keywords} for user {user_id}")
+
+        try:
+            highlight_terms = [term for kw in matched_keywords for term in hits[kw]]
+            msg, timestamp = build_notification(update, message_text, matched_keywords, group_name, highlight_terms)
+            if edited:
+                msg = msg.replace("📌 *Keyword Match!*", "📌 *Keyword Match!* ✏️ _(edited message)_", 1)
+
+            # Failed sends are queued for retry by the delivery service
+            outcome = await deliver_notification(context.bot, user_id, msg, group_id)
 
+            if outcome == SENT:
+                delivered[user_id] = matched_keywords
                 subscription_collection.update_one(
                     {"user_id": user_id, "group_id": group_id},
                     {"$set": {"last_match_time": timestamp}}
                 )
+            elif outcome == RETRY:
+                queued[user_id] = matched_keywords
 
-            except Exception as e:
-                print(f"❌ Failed to forward to user {user_id}: {e}")
+        except Exception as e:
+            print(f"❌ Failed to forward to user {user_id}: {e}")
+
+    defer_notifications(deferred)
+
+    # History and stats only show alerts that went out (or will, in a digest)
+    link = message_link(update)
+    for user_id, matched_keywords in delivered.items():
+        record_match(user_id, group_id, group_name, matched_keywords, message, link)
+    count_matches(group_id, delivered)
+
+    # Edits only skip keywords these users got (or will get) an alert for
+    notified_messages.remember(group_id, message.message_id, {**delivered, **queued})
+
+def build_notification(update, message_text, matched_keywords, group_name, highlight_terms=None):
+    """Render the alert sent to a user; returns (text, timestamp)"""
+    highlighted = message_text
+    for term in dict.fromkeys(highlight_terms or matched_keywords):
+        highlighted = highlighted.replace(term.lower(), f"*{term.lower()}*")
+
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    link = message_link(update)
+    if link:
+        link_text = f"[View message]({link})"
+    else:
+        link_text = "_Message link unavailable (private group)_"
+
+    sender = update.effective_user
+    sender_name = sender.full_name
+    sender_username = f"(@{sender.username})" if sender.username else ""
+
+    msg = (
+        f"📌 *Keyword Match!*\n"
+        f"🔍 *Matched:* {', '.join(f'`{kw}`' for kw in matched_keywords)}\n"
+        f"👤 *Sender:* {sender_name} {sender_username}\n"
+        f"👥 *Group:* `{group_name}`\n"
+        f"🕒 *Time:* `{timestamp}`\n"
+        f"{link_text}\n\n"
+        f"🗨️ *Message:* {highlighted}"
+    )
+    return msg, timestamp
+
+def message_link(update):
+    """Public t.me link to the message, or None for private groups"""
+    if update.effective_chat.username:
+        return f"https://t.me/{update.effective_chat.username}/{update.effective_message.message_id}"
+    return None
+
+def track_membership_changes(update):
+    """Join/leave service messages keep the membership cache current"""
+    message = update.message
+    if not message:
+        return
+    group_id = update.effective_chat.id
+    for user in message.new_chat_members or ():
+        record_membership(group_id, user.id, True)
+    if message.left_chat_member:
+        record_membership(group_id, message.left_chat_member.id, False)
 
 def should_sync_metadata(update) -> bool:
     """Only sync on group name changes"""
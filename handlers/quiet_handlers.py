@@ -0,0 +1,53 @@
+from telegram import Update
+from telegram.ext import ContextTypes
+from services.quiet_hours import (
+    parse_clock, parse_timezone, set_quiet_hours, clear_quiet_hours, get_quiet_hours
+)
+
+QUIET_USAGE = (
+    "🌙 *Quiet hours*\n\n"
+    "Pause alerts for part of the day and get one digest when the window ends.\n\n"
+    "`/quiet 23:00-07:00 Europe/Berlin` – set a window in your timezone\n"
+    "`/quiet off` – turn quiet hours off\n"
+    "`/quiet` – show your current setting"
+)
+
+async def quiet_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    args = context.args or []
+
+    if not args:
+        quiet = get_quiet_hours(user_id)
+        if quiet:
+            status = f"🌙 Quiet hours: *{quiet['start']}–{quiet['end']}* ({quiet['tz']})\n\n"
+        else:
+            status = "🔔 Quiet hours are off.\n\n"
+        await update.message.reply_text(status + QUIET_USAGE, parse_mode="Markdown")
+        return
+
+    if args[0].lower() == "off":
+        clear_quiet_hours(user_id)
+        await update.message.reply_text("🔔 Quiet hours turned off. Matches held so far arrive with the next digest.")
+        return
+
+    window = args[0].split("-")
+    start = parse_clock(window[0]) if len(window) == 2 else None
+    end = parse_clock(window[1]) if len(window) == 2 else None
+    if not start or not end or start == end:
+        await update.message.reply_text("❌ Use a window like `23:00-07:00`.", parse_mode="Markdown")
+        return
+
+    tz_name = args[1] if len(args) > 1 else "UTC"
+    if parse_timezone(tz_name) is None:
+        await update.message.reply_text(
+            "❌ Unknown timezone. Use a name like `Europe/Berlin`, `Asia/Kolkata` or `UTC`.",
+            parse_mode="Markdown"
+        )
+        return
+
+    set_quiet_hours(user_id, start, end, tz_name)
+    await update.message.reply_text(
+        f"🌙 Quiet hours set: *{start}–{end}* ({tz_name}).\n"
+        f"Matches during this time are collected and sent as one digest at {end}.",
+        parse_mode="Markdown"
+    )
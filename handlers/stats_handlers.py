@@ -0,0 +1,70 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from telegram import Update
+from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
+from database.connection import get_db
+from services.keyword_index import decode_keyword
+from services.stats import load_buckets, bucket_start, USER, GROUP
+
+db = get_db()
+subscription_collection = db["user_subscriptions"]
+
+STATS_DAYS = 7
+STATS_TOP = 10
+
+def sum_buckets(buckets):
+    """Merge bucket documents into (matches, messages, keyword counter, group counter)"""
+    matches = messages = 0
+    keywords, groups = Counter(), Counter()
+    for bucket in buckets:
+        matches += bucket.get("matches", 0)
+        messages += bucket.get("messages", 0)
+        keywords.update({decode_keyword(k): n for k, n in bucket.get("keywords", {}).items()})
+        groups.update({int(g): n for g, n in bucket.get("groups", {}).items()})
+    return matches, messages, keywords, groups
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    now = datetime.utcnow()
+    week_start = bucket_start(now - timedelta(days=STATS_DAYS - 1), "day")
+
+    matches_24h, _, _, _ = sum_buckets(
+        load_buckets(USER, [user_id], "hour", bucket_start(now - timedelta(hours=23), "hour"))
+    )
+    matches_week, _, keywords, my_group_matches = sum_buckets(load_buckets(USER, [user_id], "day", week_start))
+
+    subs = {
+        sub["group_id"]: sub.get("group_name", f"Group {sub['group_id']}")
+        for sub in subscription_collection.find(
+            {"user_id": user_id, "subscribed": True}, {"_id": 0, "group_id": 1, "group_name": 1}
+        )
+    }
+    volume = Counter()
+    for bucket in load_buckets(GROUP, subs.keys(), "day", week_start):
+        volume[bucket["owner"]] += bucket.get("messages", 0)
+
+    lines = [
+        "📊 *Your stats*",
+        f"🎯 Matches: *{matches_24h}* in the last 24h · *{matches_week}* in {STATS_DAYS} days",
+    ]
+
+    if keywords:
+        lines.append(f"\n🔑 *Most frequent keywords ({STATS_DAYS} days)*")
+        for kw, count in keywords.most_common(STATS_TOP):
+            lines.append(f"• `{kw}` – {count}")
+        lines.append("_Very frequent keywords can be narrowed with AND/NOT, e.g._ `python AND remote`")
+
+    if subs:
+        lines.append(f"\n👥 *Your groups ({STATS_DAYS} days)*")
+        ranked = sorted(subs, key=lambda group_id: volume[group_id], reverse=True)[:STATS_TOP]
+        for group_id in ranked:
+            lines.append(
+                f"• {escape_markdown(subs[group_id])} – {volume[group_id]} messages, "
+                f"{my_group_matches[group_id]} matches for you"
+            )
+
+    if not keywords and not subs:
+        lines.append("\nNo activity yet. Subscribe to groups with /groups and add keywords with /add.")
+
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
@@ -1,6 +1,13 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from database.connection import get_db
+from services.delivery import reactivate_dead_recipient
+from services.dashboard_cache import get_or_create_dashboard, invalidate_dashboard
+from services.keyword_index import index_apply_bulk
+from services.quiet_hours import clear_quiet_hours, clear_deferred
+from services.history import clear_history
+from services.stats import clear_user_stats
+from services.global_keywords import GLOBAL_SCOPE, GLOBAL_SCOPE_NAME, get_global_keywords, clear_global_keywords
 
 db = get_db()
 subscription_collection = db["user_subscriptions"]
@@ -18,6 +25,13 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "📌 *Note:* Send all commands here in *PingYou Bot private chat*, *not in the group*. \n\n"
         "ℹ️ *To view all commands and what they do, type /help*"
     )
+
+    # Users who blocked the bot had their subscriptions muted automatically
+    reactivated = reactivate_dead_recipient(update.effective_user.id)
+    if reactivated:
+        invalidate_dashboard(update.effective_user.id)
+        welcome_text += f"\n\n🔔 *Welcome back!* Notifications were re-enabled for {reactivated} group(s)."
+
     await update.message.reply_text(welcome_text, parse_mode="Markdown")
     pass
 
@@ -29,14 +43,23 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     🔹 *Group Management:*
     /groups – View and manage the groups you're tracking  
-    /use – Select a group to manage its keywords  
+    /use – Select a group to manage its keywords (or 🌐 All my groups for global keywords)  
     /reset – ⚠️ Delete all your data (groups + keywords)  
 
     🔹 *Keyword Management:*
     /add – Add keywords to track (comma-separated to add multiple keywords: `/add job,intern,remote`)  
+    Typo-tolerant keywords: `/add internship~` (1 typo) or `/add javascript~2` (2 typos)  
+    Combined keywords: `/add python AND remote NOT senior` or `/add "machine learning" AND remote`  
     /remove – Remove one or more keywords  
     /list – View keywords in the currently selected group  
     /keywords – View all keywords you’re tracking across groups  
+    /import – Bulk-add keywords from a CSV/JSON file  
+    /export – Download all your keywords as CSV (`/export json` for JSON)  
+
+    🔹 *Notifications:*
+    /quiet – Pause alerts overnight and get one digest (`/quiet 23:00-07:00 Europe/Berlin`)  
+    /history – Your recent matches (`/history group=<name>` or `/history keyword=<keyword>`)  
+    /stats – How often your keywords matched and how busy your groups are  
 
     ❗ *Reminder:*  
     Send all commands *here in the PingYou Bot chat*, *not in any group*.
@@ -72,7 +95,21 @@ async def handle_reset_callback(update: Update, context: ContextTypes.DEFAULT_TY
     user_id = query.from_user.id
     
     if query.data == "confirm_reset":
+        subs = list(subscription_collection.find(
+            {"user_id": user_id, "subscribed": True},
+            {"_id": 0, "group_id": 1, "keywords": 1}
+        ))
         subscription_collection.delete_many({"user_id": user_id})
+        clear_global_keywords(user_id)
+        clear_quiet_hours(user_id)
+        clear_deferred(user_id)
+        clear_history(user_id)
+        clear_user_stats(user_id)
+        index_apply_bulk([
+            ("unsubscribe", sub["group_id"], user_id, sub.get("keywords", []))
+            for sub in subs
+        ])
+        invalidate_dashboard(user_id)
         await query.edit_message_text(
             "🧹 All your data has been completely reset.",
             parse_mode="Markdown"
@@ -83,62 +120,139 @@ async def handle_reset_callback(update: Update, context: ContextTypes.DEFAULT_TY
             parse_mode="Markdown"
         )
 
-async def keywords_overview(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    MAX_MESSAGE_LENGTH = 390  # Leave buffer under Telegram’s 4096 limit
-    KEYWORDS_PER_PAGE = 1      # Number of groups per page
+DASHBOARD_LENGTH_BUDGET = 3800  # Leave buffer under Telegram’s 4096 limit for header/footer
+DASHBOARD_FETCH_SIZE = 25       # Groups read from Mongo per page build
+DASHBOARD_PROJECTION = {"_id": 0, "group_id": 1, "group_name": 1, "keywords": 1}
+DASHBOARD_SORT = [("group_name", 1), ("group_id", 1)]
+
+def get_dashboard_totals(user_id):
+    """Group/keyword totals computed by Mongo instead of loading every row"""
+    result = list(subscription_collection.aggregate([
+        {"$match": {"user_id": user_id, "subscribed": True}},
+        {"$group": {
+            "_id": None,
+            "groups": {"$sum": 1},
+            "keywords": {"$sum": {"$size": {"$ifNull": ["$keywords", []]}}}
+        }}
+    ]))
+    if not result:
+        return 0, 0
+    return result[0]["groups"], result[0]["keywords"]
+
+def render_group_section(sub, budget):
+    group_name = sub.get("group_name", f"Group {sub['group_id']}")
+    keywords = sub.get("keywords", [])
+
+    if not keywords:
+        return "\n".join([f"*📌 {group_name}*", "⚠️ No keywords tracked in this group yet."])
+
+    lines = [f"*📌 {group_name}* ({len(keywords)} keywords)"]
+    length = len(lines[0])
+    for i, kw in enumerate(keywords):
+        line = f"• `{kw}`"
+        if length + len(line) + 1 > budget:
+            lines.append(f"_…and {len(keywords) - i} more_")
+            break
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+def build_dashboard_page(user_id, start_key, budget=DASHBOARD_LENGTH_BUDGET):
+    """
+    Pack as many groups as fit in `budget` characters, starting after
+    start_key = [group_name, group_id] (None for the first page).
+    Returns (sections, next_key); next_key is None on the last page.
+    """
+    query = {"user_id": user_id, "subscribed": True}
+    if start_key:
+        last_name, last_id = start_key
+        query["$or"] = [
+            {"group_name": {"$gt": last_name}},
+            {"group_name": last_name, "group_id": {"$gt": last_id}},
+        ]
 
+    docs = list(
+        subscription_collection.find(query, DASHBOARD_PROJECTION)
+        .sort(DASHBOARD_SORT)
+        .limit(DASHBOARD_FETCH_SIZE + 1)
+    )
+
+    sections = []
+    used = 0
+    last_key = None
+    for sub in docs[:DASHBOARD_FETCH_SIZE]:
+        section = render_group_section(sub, budget)
+
+        if sections and used + len(section) + 2 > budget:
+            return sections, last_key
+
+        sections.append(section)
+        used += len(section) + 2
+        last_key = [sub.get("group_name"), sub["group_id"]]
+
+    has_more = len(docs) > DASHBOARD_FETCH_SIZE
+    return sections, (last_key if has_more else None)
+
+async def keywords_overview(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
+
+    if update.message:  # Fresh /keywords always starts on the first page
+        context.user_data["kw_page"] = 0
+        context.user_data["kw_page_keys"] = [None]
+
     page = context.user_data.get("kw_page", 0)
+    page_keys = context.user_data.setdefault("kw_page_keys", [None])
+    if page >= len(page_keys):
+        # Lost track of where this page starts - go back to the beginning
+        page = context.user_data["kw_page"] = 0
 
-    subscriptions = list(subscription_collection.find({
-        "user_id": user_id,
-        "subscribed": True
-    }))
+    dashboard = get_or_create_dashboard(user_id)
+    if dashboard["totals"] is None:
+        global_keywords = get_global_keywords(user_id)
+        dashboard["totals"] = get_dashboard_totals(user_id) + (global_keywords,)
+    total_groups, total_keywords, global_keywords = dashboard["totals"]
 
-    if not subscriptions:
+    if not total_groups and not global_keywords:
         if update.message:
             await update.message.reply_text("ℹ️ You don't have any active keyword subscriptions.")
         else:
             await update.callback_query.edit_message_text("ℹ️ You don't have any active keyword subscriptions.")
         return
 
-    total_groups = len(subscriptions)
-    total_keywords = sum(len(sub.get("keywords", [])) for sub in subscriptions)
+    cached = dashboard["pages"].get(page)
+    if cached is None:
+        message = [f"🔍 *Your Keyword Dashboard*\n(Page {page + 1})\n"]
+        budget = DASHBOARD_LENGTH_BUDGET
 
-    # Pagination logic
-    start = page * KEYWORDS_PER_PAGE
-    end = start + KEYWORDS_PER_PAGE
-    current_groups = subscriptions[start:end]
+        if page == 0 and global_keywords:
+            # Global keywords are listed once, on the first page
+            global_section = render_group_section(
+                {"group_id": GLOBAL_SCOPE, "group_name": GLOBAL_SCOPE_NAME, "keywords": global_keywords},
+                budget
+            )
+            message.append(global_section + "\n_(apply to every group you're tracking)_")
+            budget -= len(message[-1]) + 2
 
-    message = [f"🔍 *Your Keyword Dashboard*\n(Page {page + 1} of {(total_groups - 1) // KEYWORDS_PER_PAGE + 1})\n"]
-    
-    for sub in current_groups:
-        group_name = sub.get("group_name", f"Group {sub['group_id']}")
-        keywords = sub.get("keywords", [])
+        sections, next_key = build_dashboard_page(user_id, page_keys[page], budget)
+        message += sections
+        message.append(f"\n*ℹ️ Total: {total_groups} groups, {total_keywords} keywords, {len(global_keywords)} global*")
+        cached = ("\n".join(message), next_key)
+        dashboard["pages"][page] = cached
 
-        if keywords:
-            section = [f"*📌 {group_name}* ({len(keywords)} keywords)"]
-            section += [f"• `{kw}`" for kw in keywords]
-        else:
-            section = [f"*📌 {group_name}*", "⚠️ No keywords tracked in this group yet."]
-            
-        section_text = "\n".join(section)
-        
-        if sum(len(line) + 1 for line in message) + len(section_text) > MAX_MESSAGE_LENGTH:
-            break
-        
-        message.append(section_text)
+    text, next_key = cached
 
-    message.append(f"\n*ℹ️ Total: {total_groups} groups, {total_keywords} keywords*")
+    # Remember where the next page starts (range key, not an offset)
+    if next_key is not None:
+        del page_keys[page + 1:]
+        page_keys.append(next_key)
 
     buttons = []
-    if start > 0:
+    if page > 0:
         buttons.append(InlineKeyboardButton("⬅️ Previous", callback_data="kwpage_prev_page"))
-    if end < total_groups:
+    if next_key is not None:
         buttons.append(InlineKeyboardButton("➡️ Next", callback_data="kwpage_next_page"))
 
     reply_markup = InlineKeyboardMarkup([buttons]) if buttons else None
-    text = "\n".join(message)
 
     if update.message:  # Triggered by /keywords
         await update.message.reply_text(text, parse_mode="Markdown", reply_markup=reply_markup)
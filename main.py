@@ -1,15 +1,68 @@
+from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, MessageHandler, ChatMemberHandler, filters
-from handlers.group_handlers import list_groups, group_detail, handle_group_actions, bot_added, handle_migration, periodic_group_health_check
+from handlers.group_handlers import handle_chat_member_update, list_groups, group_detail, handle_group_actions, bot_added, handle_migration, periodic_group_health_check
 from handlers.keyword_handlers import use_group, handle_use_button, add_keyword, list_keywords, remove_keyword, handle_remove_callback, show_remove_menu
-from handlers.message_handlers import handle_group_message
+from handlers.message_handlers import handle_group_message, ignore_private_edit
+from handlers.quiet_handlers import quiet_command
+from handlers.history_handlers import history_command, handle_history_page_nav
+from handlers.stats_handlers import stats_command
+from handlers.import_export_handlers import import_command, export_command, handle_import_file
 from handlers.utility_handlers import start, help_command, keywords_overview, reset_command, handle_reset_callback, handle_keyword_page_nav
-from config import BOT_TOKEN
+from services.delivery import process_delivery_queue, DELIVERY_POLL_INTERVAL
+from database.indexes import ensure_indexes
+from services.keyword_index import ensure_keyword_index
+from database.persistence import MongoPersistence, evict_idle_persistence, EVICTION_INTERVAL
+from services.sharding import start_sharding, stop_sharding
+from services.edit_tracking import report_edit_tracking, EDIT_STATS_INTERVAL
+from services.stats import flush_stats_job, flush_stats_now, STATS_FLUSH_INTERVAL
+from services.history import flush_history_job, flush_history_now, HISTORY_FLUSH_INTERVAL
+from services.quiet_hours import release_due_digests, DIGEST_POLL_INTERVAL
+from services.snapshot import load_snapshot, save_snapshot, save_snapshot_job, SNAPSHOT_INTERVAL
+from services.rate_limiter import PriorityRateLimiter, report_lane_stats, LANE_STATS_INTERVAL
+from services.match_offload import configure_match_pool, shutdown_match_pool
+from config import BOT_TOKEN, SHARD_WORKERS, MATCH_POOL_WORKERS, SNAPSHOT_PATH, BOT_MODE, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+
+# Only the update types we have handlers for
+ALLOWED_UPDATES = [Update.MESSAGE, Update.EDITED_MESSAGE, Update.CALLBACK_QUERY, Update.MY_CHAT_MEMBER, Update.CHAT_MEMBER]
+
+async def post_init(app):
+    ensure_indexes()
+    ensure_keyword_index()
+    if SNAPSHOT_PATH:
+        # When sharded the workers own every group; the front only saves the file
+        load_snapshot(group_filter=(lambda group_id: False) if SHARD_WORKERS > 1 else None)
+    if SHARD_WORKERS > 1:
+        # Shard workers already spread matching over cores
+        start_sharding(SHARD_WORKERS, BOT_TOKEN, app.bot.rate_limiter)
+    else:
+        configure_match_pool(MATCH_POOL_WORKERS)
+
+async def post_stop(app):
+    # Runs after the update queue is drained, so every routed message is queued
+    stop_sharding()
+    shutdown_match_pool()
+    flush_history_now()
+    flush_stats_now()
+    if SNAPSHOT_PATH:
+        save_snapshot()
 
 def main():
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .persistence(MongoPersistence())
+        .rate_limiter(PriorityRateLimiter())
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .build()
+    )
+
+    # Edited messages are only matched in groups (handle_group_message)
+    app.add_handler(MessageHandler(filters.UpdateType.EDITED_MESSAGE & ~filters.ChatType.GROUPS, ignore_private_edit), group=-1)
 
     # Group monitoring (Enhanced for real-time updates)
     app.add_handler(ChatMemberHandler(bot_added, ChatMemberHandler.MY_CHAT_MEMBER))
+    app.add_handler(ChatMemberHandler(handle_chat_member_update, ChatMemberHandler.CHAT_MEMBER))
     app.add_handler(MessageHandler(filters.StatusUpdate.MIGRATE, handle_migration))
     app.add_handler(MessageHandler(filters.ChatType.GROUPS, handle_group_message))
     
@@ -34,14 +87,54 @@ def main():
     app.add_handler(CallbackQueryHandler(handle_remove_callback, pattern="^kw_"))
     app.add_handler(CommandHandler("keywords", keywords_overview))
     app.add_handler(CallbackQueryHandler(handle_keyword_page_nav, pattern="^kwpage_"))
+    app.add_handler(CommandHandler("import", import_command))
+    app.add_handler(CommandHandler("export", export_command))
+    app.add_handler(MessageHandler(filters.ChatType.PRIVATE & filters.Document.ALL, handle_import_file))
+    app.add_handler(CommandHandler("quiet", quiet_command))
+    app.add_handler(CommandHandler("history", history_command))
+    app.add_handler(CallbackQueryHandler(handle_history_page_nav, pattern="^histpage_"))
+    app.add_handler(CommandHandler("stats", stats_command))
     
     # Help commands (unchanged)
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_command))
     
 
-    print("Bot is running...")
-    app.run_polling()
+    # Background retry worker for failed notifications
+    app.job_queue.run_repeating(process_delivery_queue, interval=DELIVERY_POLL_INTERVAL, first=10)
+    # Keep persisted user_data/chat_data memory bounded
+    app.job_queue.run_repeating(evict_idle_persistence, interval=EVICTION_INTERVAL, first=EVICTION_INTERVAL)
+    # Write-behind buffer of match history
+    app.job_queue.run_repeating(flush_history_job, interval=HISTORY_FLUSH_INTERVAL, first=HISTORY_FLUSH_INTERVAL)
+    # Pre-aggregated match statistics
+    app.job_queue.run_repeating(flush_stats_job, interval=STATS_FLUSH_INTERVAL, first=STATS_FLUSH_INTERVAL)
+    # Hit ratio of the edited-message cache
+    app.job_queue.run_repeating(report_edit_tracking, interval=EDIT_STATS_INTERVAL, first=EDIT_STATS_INTERVAL)
+    # Quiet-hours digests: one job for all users, driven by a release heap
+    app.job_queue.run_repeating(release_due_digests, interval=DIGEST_POLL_INTERVAL, first=DIGEST_POLL_INTERVAL)
+    # Per-lane Bot API latency (interactive vs notifications vs background)
+    app.job_queue.run_repeating(report_lane_stats, interval=LANE_STATS_INTERVAL, first=LANE_STATS_INTERVAL)
+    # Warm-start snapshot of the keyword index for the next restart
+    if SNAPSHOT_PATH:
+        app.job_queue.run_repeating(save_snapshot_job, interval=SNAPSHOT_INTERVAL, first=SNAPSHOT_INTERVAL)
+
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise SystemExit("BOT_MODE=webhook needs WEBHOOK_URL (the public https URL Telegram calls)")
+        if not WEBHOOK_SECRET:
+            print("⚠️ WEBHOOK_SECRET is not set - anyone who finds the URL can post updates")
+        print("Bot is running (webhook)...")
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=ALLOWED_UPDATES,
+        )
+    else:
+        print("Bot is running...")
+        app.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
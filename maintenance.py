@@ -0,0 +1,43 @@
+"""
+Offline maintenance commands. Run from the project root, e.g.:
+
+    python maintenance.py rebuild-index
+    python maintenance.py rebuild-index --group -1001234567890
+    python maintenance.py repair-duplicates --batch-size 500
+"""
+import argparse
+from database.indexes import ensure_indexes, ensure_unique_subscriptions
+from services.keyword_index import rebuild_all_indexes, rebuild_group_index
+from services.migration import repair_duplicate_subscriptions, REPAIR_BATCH_SIZE
+
+def rebuild_index(args):
+    if args.group is not None:
+        doc = rebuild_group_index(args.group)
+        print(f"Rebuilt index for group {args.group}: {len(doc['subscribers'])} subscribers, {len(doc['keywords'])} keywords")
+    else:
+        rebuild_all_indexes()
+
+def repair_duplicates(args):
+    result = repair_duplicate_subscriptions(args.batch_size)
+    print(f"Merged {result['merged']} duplicate subscriptions in {result['groups']} groups ({result['removed']} rows removed)")
+    if ensure_unique_subscriptions():
+        print("Unique (user_id, group_id) index is in place")
+
+def main():
+    parser = argparse.ArgumentParser(description="PingYou Bot maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-index", help="Rebuild group_keyword_index from user_subscriptions")
+    rebuild.add_argument("--group", type=int, help="Only rebuild this group id")
+    rebuild.set_defaults(func=rebuild_index)
+
+    repair = commands.add_parser("repair-duplicates", help="Merge duplicate (user_id, group_id) subscriptions")
+    repair.add_argument("--batch-size", type=int, default=REPAIR_BATCH_SIZE, help="Duplicate keys merged per bulk write")
+    repair.set_defaults(func=repair_duplicates)
+
+    args = parser.parse_args()
+    ensure_indexes()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+class AsyncTTLCache:
+    """
+    Small in-process cache for awaitable lookups (Bot API calls mostly).
+
+    - entries expire after `ttl` seconds (dropped lazily on lookup)
+    - when full, the least recently used entry is evicted
+    - concurrent lookups of the same key share a single in-flight request
+    - errors listed in `negative_on` are cached for `negative_ttl` seconds and
+      re-raised on hit, so we stop hammering chats we can't access
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float = 0, negative_on=(), max_size: int = 10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.negative_on = tuple(negative_on)
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (expires_at, ok, value_or_error), LRU order
+        self._inflight = {}  # key -> asyncio.Future
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, key):
+        """Return (found, ok, value) without triggering a fetch"""
+        entry = self._entries.get(key)
+        if not entry:
+            return False, None, None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return False, None, None
+        self._entries.move_to_end(key)
+        return True, entry[1], entry[2]
+
+    async def get(self, key, fetch, refresh: bool = False):
+        if not refresh:
+            found, ok, value = self.peek(key)
+            if found:
+                self.hits += 1
+                if ok:
+                    return value
+                raise value
+
+        # Someone is already fetching this key - wait for their result
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except Exception as e:
+            if self.negative_on and isinstance(e, self.negative_on):
+                self.set(key, e, ok=False)
+            future.set_exception(e)
+            future.exception()  # mark as retrieved even if nobody else waited
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def set(self, key, value, ok: bool = True):
+        ttl = self.ttl if ok else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, ok, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
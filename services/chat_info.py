@@ -0,0 +1,27 @@
+from telegram.error import BadRequest, Forbidden
+from services.cache import AsyncTTLCache
+from services.rate_limiter import INTERACTIVE, lane_args
+
+CHAT_INFO_TTL = 10 * 60
+# Inaccessible chats (bot kicked, chat deleted/migrated) are remembered
+# for a shorter time so we notice if the bot gets re-added
+CHAT_INFO_NEGATIVE_TTL = 2 * 60
+
+chat_info_cache = AsyncTTLCache(
+    ttl=CHAT_INFO_TTL,
+    negative_ttl=CHAT_INFO_NEGATIVE_TTL,
+    negative_on=(Forbidden, BadRequest),
+)
+
+async def get_chat_cached(bot, chat_id: int, refresh: bool = False, lane: str = INTERACTIVE):
+    """
+    Cached replacement for bot.get_chat. Raises the same errors get_chat
+    would; "chat not accessible" errors are cached too.
+    """
+    return await chat_info_cache.get(
+        chat_id, lambda: bot.get_chat(chat_id, rate_limit_args=lane_args(lane)), refresh=refresh
+    )
+
+def invalidate_chat(chat_id: int):
+    """Forget cached info for a chat (e.g. after a title change or migration)"""
+    chat_info_cache.invalidate(chat_id)
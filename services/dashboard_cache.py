@@ -0,0 +1,30 @@
+from collections import OrderedDict
+
+# Rendered /keywords pages per user. Entries are dropped whenever the user's
+# subscriptions or keywords change, so a hit is always up to date.
+MAX_CACHED_DASHBOARDS = 2000
+
+_dashboards = OrderedDict()  # user_id -> {"totals": (...), "pages": {page: (...)}}
+
+def get_dashboard(user_id: int):
+    entry = _dashboards.get(user_id)
+    if entry is not None:
+        _dashboards.move_to_end(user_id)
+    return entry
+
+def get_or_create_dashboard(user_id: int):
+    entry = get_dashboard(user_id)
+    if entry is None:
+        entry = {"totals": None, "pages": {}}
+        _dashboards[user_id] = entry
+        while len(_dashboards) > MAX_CACHED_DASHBOARDS:
+            _dashboards.popitem(last=False)
+    return entry
+
+def invalidate_dashboard(user_id: int):
+    """Call after any change to a user's subscriptions or keywords"""
+    _dashboards.pop(user_id, None)
+
+def invalidate_all_dashboards():
+    """Call after changes that touch many users (group renamed/removed)"""
+    _dashboards.clear()
@@ -0,0 +1,248 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from telegram.ext import ContextTypes
+from database.connection import get_db
+from services.dashboard_cache import invalidate_dashboard
+from services.keyword_index import index_apply_bulk
+from services.rate_limiter import NOTIFY, lane_args
+
+db = get_db()
+delivery_queue = db["delivery_queue"]
+dead_letter_collection = db["delivery_dead_letters"]
+subscription_collection = db["user_subscriptions"]
+
+MAX_DELIVERY_ATTEMPTS = 6
+BASE_BACKOFF_SECONDS = 5
+MAX_BACKOFF_SECONDS = 30 * 60
+DELIVERY_BATCH_SIZE = 50
+DELIVERY_LEASE_SECONDS = 120
+DELIVERY_POLL_INTERVAL = 15
+
+SENT = "sent"
+RETRY = "retry"
+DEAD = "dead"
+
+# Subscriptions muted because the user blocked the bot / deleted the account.
+# These are switched back on automatically when the user sends /start again.
+DEAD_RECIPIENT_REASON = "bot_blocked"
+
+def is_dead_recipient_error(error) -> bool:
+    """True if the error means the user can never receive messages from us"""
+    if isinstance(error, Forbidden):
+        # "bot was blocked by the user", "user is deactivated", ...
+        return True
+    if isinstance(error, BadRequest) and "chat not found" in str(error).lower():
+        return True
+    return False
+
+def classify_delivery_error(error):
+    """Decide whether a failed send is worth retrying, and after how long"""
+    if isinstance(error, RetryAfter):
+        return RETRY, error.retry_after
+    if isinstance(error, (Forbidden, BadRequest)):
+        # Blocked bot, bad markdown, deleted chat... retrying will not help
+        return DEAD, None
+    if isinstance(error, NetworkError):
+        # Includes TimedOut
+        return RETRY, None
+    return RETRY, None
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, capped at MAX_BACKOFF_SECONDS"""
+    delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+async def send_notification(bot, user_id: int, text: str, group_id: int = None) -> bool:
+    """
+    Send a notification to a user. Failed sends are queued for retry instead
+    of being dropped. Returns True only if the message went out right now.
+    """
+    return await deliver_notification(bot, user_id, text, group_id) == SENT
+
+async def deliver_notification(bot, user_id: int, text: str, group_id: int = None) -> str:
+    """Like send_notification, but returns SENT, RETRY (queued) or DEAD (dead-lettered)"""
+    try:
+        await bot.send_message(
+            chat_id=user_id,
+            text=text,
+            parse_mode="Markdown",
+            disable_web_page_preview=True,
+            rate_limit_args=lane_args(NOTIFY),
+        )
+        return SENT
+    except Exception as e:
+        print(f"❌ Failed to forward to user {user_id}: {e}")
+        return handle_failed_delivery({
+            "user_id": user_id,
+            "group_id": group_id,
+            "text": text,
+            "attempts": 0,
+            "created_at": datetime.utcnow(),
+        }, e)
+
+def handle_failed_delivery(item, error):
+    """Reschedule a failed delivery with backoff, or dead-letter it. Returns RETRY or DEAD"""
+    verdict, retry_after = classify_delivery_error(error)
+    attempts = item.get("attempts", 0) + 1
+    now = datetime.utcnow()
+
+    if is_dead_recipient_error(error):
+        move_to_dead_letter(item, error, attempts)
+        mute_dead_recipient(item["user_id"], error)
+        return DEAD
+
+    if verdict == DEAD or attempts >= MAX_DELIVERY_ATTEMPTS:
+        move_to_dead_letter(item, error, attempts)
+        return DEAD
+
+    delay = retry_after if retry_after is not None else backoff_delay(attempts)
+    updates = {
+        "attempts": attempts,
+        "next_attempt_at": now + timedelta(seconds=delay),
+        "last_error": str(error),
+        "last_attempt_at": now,
+    }
+
+    if "_id" in item:
+        delivery_queue.update_one(
+            {"_id": item["_id"]},
+            {"$set": updates, "$unset": {"lease": ""}}
+        )
+    else:
+        delivery_queue.insert_one({**item, **updates})
+
+    print(f"[Delivery] Retry #{attempts} for user {item['user_id']} in {delay:.0f}s")
+    return RETRY
+
+def move_to_dead_letter(item, error, attempts):
+    """Park an undeliverable notification so it can be inspected later"""
+    record = {k: v for k, v in item.items() if k not in ("_id", "lease", "next_attempt_at")}
+    record.update({
+        "attempts": attempts,
+        "last_error": str(error),
+        "error_type": type(error).__name__,
+        "dead_at": datetime.utcnow(),
+    })
+    dead_letter_collection.insert_one(record)
+
+    if "_id" in item:
+        delivery_queue.delete_one({"_id": item["_id"]})
+
+    print(f"[Delivery] Dead-lettered message for user {item['user_id']} after {attempts} attempts: {error}")
+
+def mute_dead_recipient(user_id: int, error=None):
+    """
+    Mute every active subscription of a user who blocked the bot, and drop
+    whatever is still queued for them, so later matches skip them entirely.
+    """
+    active = list(subscription_collection.find(
+        {"user_id": user_id, "subscribed": True},
+        {"_id": 0, "group_id": 1, "keywords": 1}
+    ))
+    result = subscription_collection.update_many(
+        {"user_id": user_id, "subscribed": True},
+        {"$set": {
+            "subscribed": False,
+            "muted_reason": DEAD_RECIPIENT_REASON,
+            "muted_at": datetime.utcnow()
+        }}
+    )
+    # Take them out of every group's keyword index so matching skips them
+    index_apply_bulk([
+        ("unsubscribe", sub["group_id"], user_id, sub.get("keywords", []))
+        for sub in active
+    ])
+    invalidate_dashboard(user_id)
+
+    pending = list(delivery_queue.find({"user_id": user_id}))
+    if pending:
+        for item in pending:
+            item.pop("lease", None)
+            item.pop("next_attempt_at", None)
+            item["_queue_id"] = item.pop("_id")
+            item.update({"last_error": str(error), "dead_at": datetime.utcnow()})
+        dead_letter_collection.insert_many(pending)
+        delivery_queue.delete_many({"_id": {"$in": [item["_queue_id"] for item in pending]}})
+
+    print(f"[Delivery] User {user_id} is unreachable ({error}) - muted {result.modified_count} subscriptions, dropped {len(pending)} queued messages")
+    return result.modified_count
+
+def reactivate_dead_recipient(user_id: int) -> int:
+    """Undo mute_dead_recipient once the user talks to the bot again"""
+    muted = list(subscription_collection.find(
+        {"user_id": user_id, "muted_reason": DEAD_RECIPIENT_REASON},
+        {"_id": 0, "group_id": 1, "keywords": 1}
+    ))
+    if not muted:
+        return 0
+
+    result = subscription_collection.update_many(
+        {"user_id": user_id, "muted_reason": DEAD_RECIPIENT_REASON},
+        {
+            "$set": {"subscribed": True},
+            "$unset": {"muted_reason": "", "muted_at": ""}
+        }
+    )
+    index_apply_bulk([
+        ("subscribe", sub["group_id"], user_id, sub.get("keywords", []))
+        for sub in muted
+    ])
+    if result.modified_count:
+        print(f"[Delivery] User {user_id} is back - reactivated {result.modified_count} subscriptions")
+    return result.modified_count
+
+def claim_due_deliveries(limit: int = DELIVERY_BATCH_SIZE):
+    """
+    Lease a batch of due deliveries. A lease expires by itself, so items
+    claimed by a process that died mid-batch are picked up again later.
+    """
+    now = datetime.utcnow()
+    due = delivery_queue.find(
+        {"next_attempt_at": {"$lte": now}},
+        {"_id": 1}
+    ).sort("next_attempt_at", 1).limit(limit)
+    ids = [doc["_id"] for doc in due]
+
+    if not ids:
+        return []
+
+    lease = uuid.uuid4().hex
+    delivery_queue.update_many(
+        {"_id": {"$in": ids}, "next_attempt_at": {"$lte": now}},
+        {"$set": {
+            "lease": lease,
+            "next_attempt_at": now + timedelta(seconds=DELIVERY_LEASE_SECONDS)
+        }}
+    )
+    return list(delivery_queue.find({"lease": lease}))
+
+async def process_delivery_queue(context: ContextTypes.DEFAULT_TYPE):
+    """Background job that drains the retry queue in batches"""
+    batch = claim_due_deliveries()
+    if not batch:
+        return
+
+    delivered = 0
+    unreachable = set()
+    for item in batch:
+        if item["user_id"] in unreachable:
+            # Already dead-lettered by mute_dead_recipient
+            continue
+        try:
+            await context.bot.send_message(
+                chat_id=item["user_id"],
+                text=item["text"],
+                parse_mode="Markdown",
+                disable_web_page_preview=True,
+                rate_limit_args=lane_args(NOTIFY),
+            )
+            delivery_queue.delete_one({"_id": item["_id"]})
+            delivered += 1
+        except Exception as e:
+            if is_dead_recipient_error(e):
+                unreachable.add(item["user_id"])
+            handle_failed_delivery(item, e)
+
+    print(f"[Delivery] Retry batch done: {delivered}/{len(batch)} delivered")
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+# Edited group messages are matched again, but users are only notified about
+# keywords they weren't already notified about for that message. This LRU
+# remembers (chat_id, message_id) -> {user_id: keywords notified} for recent
+# messages. Every processed message is remembered, even without matches, so
+# a miss really means "older than the cache".
+#
+# Size is counted in slots (one per message plus one per notified user) so a
+# message that fanned out to thousands of users can't blow the budget.
+
+MAX_TRACKED_SLOTS = 200000
+EDIT_STATS_INTERVAL = 600
+
+class NotifiedMessages:
+    def __init__(self, max_slots=MAX_TRACKED_SLOTS):
+        self.max_slots = max_slots
+        self._entries = OrderedDict()  # (chat_id, message_id) -> {user_id: frozenset(keywords)}
+        self._slots = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _cost(notified):
+        return 1 + len(notified)
+
+    def get(self, chat_id: int, message_id: int):
+        """Keywords already notified per user, or None if the message isn't tracked"""
+        notified = self._entries.get((chat_id, message_id))
+        if notified is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end((chat_id, message_id))
+        return notified
+
+    def remember(self, chat_id: int, message_id: int, notified):
+        """Record (merge) keywords notified per user for a message"""
+        key = (chat_id, message_id)
+        previous = self._entries.pop(key, None)
+        merged = dict(previous or {})
+        if previous is not None:
+            self._slots -= self._cost(previous)
+        for user_id, keywords in notified.items():
+            merged[user_id] = frozenset(keywords) | merged.get(user_id, frozenset())
+
+        self._entries[key] = merged
+        self._slots += self._cost(merged)
+        while self._slots > self.max_slots and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._slots -= self._cost(evicted)
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+notified_messages = NotifiedMessages()
+
+async def report_edit_tracking(context):
+    """JobQueue callback: log how well the edit cache covers edited messages"""
+    cache = notified_messages
+    if cache.hits or cache.misses:
+        print(
+            f"[Edits] {cache.hits + cache.misses} edits, hit ratio {cache.hit_ratio():.1%}, "
+            f"{len(cache)} messages / {cache._slots} slots tracked"
+        )
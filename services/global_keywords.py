@@ -0,0 +1,51 @@
+from datetime import datetime
+from database.connection import get_db
+
+db = get_db()
+global_keyword_collection = db["user_global_keywords"]
+
+# Stored once per user: {user_id, keywords: [...], updated_at}.
+# They apply to every group where the user has subscribed=True.
+GLOBAL_SCOPE = "global"
+GLOBAL_SCOPE_NAME = "🌐 All my groups"
+MAX_GLOBAL_KEYWORDS = 50
+
+def get_global_keywords(user_id: int):
+    doc = global_keyword_collection.find_one({"user_id": user_id}, {"_id": 0, "keywords": 1})
+    return doc.get("keywords", []) if doc else []
+
+def load_global_keywords(user_ids):
+    """{user_id: [keywords]} for the given users that have any global keywords"""
+    if not user_ids:
+        return {}
+    cursor = global_keyword_collection.find(
+        {"user_id": {"$in": list(user_ids)}, "keywords.0": {"$exists": True}},
+        {"_id": 0, "user_id": 1, "keywords": 1}
+    )
+    return {doc["user_id"]: doc["keywords"] for doc in cursor}
+
+def add_global_keywords(user_id: int, keywords):
+    global_keyword_collection.update_one(
+        {"user_id": user_id},
+        {
+            "$addToSet": {"keywords": {"$each": list(keywords)}},
+            "$set": {"updated_at": datetime.utcnow()}
+        },
+        upsert=True
+    )
+
+def remove_global_keywords(user_id: int, keywords):
+    global_keyword_collection.update_one(
+        {"user_id": user_id},
+        {
+            "$pull": {"keywords": {"$in": list(keywords)}},
+            "$set": {"updated_at": datetime.utcnow()}
+        }
+    )
+
+def clear_global_keywords(user_id: int):
+    # Emptied rather than deleted so the warm-start snapshot sees the change
+    global_keyword_collection.update_one(
+        {"user_id": user_id},
+        {"$set": {"keywords": [], "updated_at": datetime.utcnow()}}
+    )
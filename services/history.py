@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime
+from pymongo import DESCENDING
+from database.connection import get_db
+
+db = get_db()
+history_collection = db["match_history"]
+
+# Every match we notify (or defer) a user about:
+#   {user_id, ts, chat_id, message_id, group_id, group_name, keywords, excerpt, link}
+# Documents expire HISTORY_RETENTION_DAYS after `ts` (TTL index).
+# Writes go through an in-memory buffer flushed in bulk off the event loop,
+# so the message path never waits for Mongo.
+
+HISTORY_RETENTION_DAYS = 30
+HISTORY_FLUSH_INTERVAL = 5
+HISTORY_FLUSH_SIZE = 500       # flush early when this many are waiting
+HISTORY_MAX_BUFFER = 20000     # drop the oldest entries if Mongo is unreachable for long
+HISTORY_PAGE_SIZE = 10
+HISTORY_EXCERPT_LENGTH = 200
+HISTORY_SORT = [("ts", DESCENDING), ("_id", DESCENDING)]
+
+_buffer = []
+_flush_task = None
+
+def record_match(user_id: int, group_id: int, group_name: str, keywords, message, link=None):
+    _buffer.append({
+        "user_id": user_id,
+        "ts": datetime.utcnow(),
+        "chat_id": group_id,
+        "message_id": message.message_id,
+        "group_id": group_id,
+        "group_name": group_name,
+        "keywords": list(keywords),
+        "excerpt": (message.text or "")[:HISTORY_EXCERPT_LENGTH],
+        "link": link,
+    })
+    if len(_buffer) > HISTORY_MAX_BUFFER:
+        del _buffer[:len(_buffer) - HISTORY_MAX_BUFFER]
+    if len(_buffer) >= HISTORY_FLUSH_SIZE:
+        _schedule_flush()
+
+def _schedule_flush():
+    global _flush_task
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.get_running_loop().create_task(flush_history())
+
+def _take_batch():
+    batch = _buffer[:]
+    del _buffer[:len(batch)]
+    return batch
+
+def _write(batch):
+    try:
+        history_collection.insert_many(batch, ordered=False)
+    except Exception as e:
+        print(f"[History] Failed to write {len(batch)} entries: {e} - will retry")
+        _buffer[:0] = batch
+        return 0
+    return len(batch)
+
+async def flush_history():
+    batch = _take_batch()
+    if batch:
+        await asyncio.to_thread(_write, batch)
+
+async def flush_history_job(context):
+    """JobQueue callback"""
+    await flush_history()
+
+def flush_history_now():
+    """Blocking flush for shutdown"""
+    batch = _take_batch()
+    if batch:
+        written = _write(batch)
+        print(f"[History] Flushed {written} entries on shutdown")
+
+def find_history_page(user_id: int, start_key=None, group_id=None, keyword=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Newest-first page of a user's history, continuing after start_key =
+    [ts, _id] of the previous page's last entry. Returns (entries, next_key).
+    """
+    query = {"user_id": user_id}
+    if group_id is not None:
+        query["group_id"] = group_id
+    if keyword:
+        query["keywords"] = keyword
+    if start_key:
+        last_ts, last_id = start_key
+        query["$or"] = [
+            {"ts": {"$lt": last_ts}},
+            {"ts": last_ts, "_id": {"$lt": last_id}},
+        ]
+
+    entries = list(history_collection.find(query).sort(HISTORY_SORT).limit(limit + 1))
+    if len(entries) > limit:
+        entries = entries[:limit]
+        last = entries[-1]
+        return entries, [last["ts"], last["_id"]]
+    return entries, None
+
+def clear_history(user_id: int):
+    history_collection.delete_many({"user_id": user_id})
@@ -0,0 +1,223 @@
+import itertools
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from pymongo import UpdateOne
+from database.connection import get_db
+from services.matcher import KeywordMatcher, normalize_keyword
+from services.global_keywords import load_global_keywords
+
+db = get_db()
+index_collection = db["group_keyword_index"]
+subscription_collection = db["user_subscriptions"]
+
+# One document per group:
+#   {group_id, keywords: {<encoded keyword>: [user_id, ...]},
+#    subscribers: [user_id, ...], version, updated_at}
+# Only subscriptions with subscribed=True are represented.
+# Global keywords (services.global_keywords) are not copied in here; they are
+# merged into a group's matcher for its subscribers when it's compiled.
+
+MAX_CACHED_GROUPS = 5000
+
+_matcher_cache = OrderedDict()  # group_id -> KeywordMatcher
+_matcher_tokens = itertools.count(1)  # unique per compiled matcher (match pool cache key)
+_invalidation_listeners = []    # called with a group_id (or None for all) on changes
+_warm_documents = {}            # group_id -> index document from the startup snapshot
+_warm_global_keywords = {}      # user_id -> global keywords, same snapshot
+
+def encode_keyword(keyword: str) -> str:
+    """Mongo field names can't contain '.' or start with '$'"""
+    return keyword.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def decode_keyword(field: str) -> str:
+    return field.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+# -- write path -----------------------------------------------------------
+
+def _add_update(user_id, keywords):
+    now = datetime.utcnow()
+    add_to_set = {"subscribers": user_id}
+    for kw in keywords:
+        add_to_set[f"keywords.{encode_keyword(normalize_keyword(kw))}"] = user_id
+    return {"$addToSet": add_to_set, "$inc": {"version": 1}, "$set": {"updated_at": now}}
+
+def _remove_update(user_id, keywords, unsubscribe=False):
+    now = datetime.utcnow()
+    pull = {f"keywords.{encode_keyword(normalize_keyword(kw))}": user_id for kw in keywords}
+    if unsubscribe:
+        pull["subscribers"] = user_id
+    return {"$pull": pull, "$inc": {"version": 1}, "$set": {"updated_at": now}}
+
+def index_add_keywords(group_id: int, user_id: int, keywords):
+    """User (subscribed to group_id) now tracks `keywords` there"""
+    index_collection.update_one({"group_id": group_id}, _add_update(user_id, keywords), upsert=True)
+    invalidate_group(group_id)
+
+def index_remove_keywords(group_id: int, user_id: int, keywords):
+    """User stopped tracking `keywords` in group_id but is still subscribed"""
+    if not keywords:
+        return
+    index_collection.update_one({"group_id": group_id}, _remove_update(user_id, keywords))
+    invalidate_group(group_id)
+
+def index_subscribe_user(group_id: int, user_id: int, keywords):
+    """User joined or unmuted group_id; all their keywords become active"""
+    index_add_keywords(group_id, user_id, keywords)
+
+def index_unsubscribe_user(group_id: int, user_id: int, keywords):
+    """User muted or left group_id"""
+    index_collection.update_one({"group_id": group_id}, _remove_update(user_id, keywords, unsubscribe=True))
+    invalidate_group(group_id)
+
+def index_apply_bulk(changes):
+    """
+    Apply many index changes in one round trip.
+    `changes` is a list of (action, group_id, user_id, keywords) with action
+    "add"/"subscribe", "remove" or "unsubscribe".
+    """
+    ops = []
+    for action, group_id, user_id, keywords in changes:
+        if action in ("add", "subscribe"):
+            ops.append(UpdateOne({"group_id": group_id}, _add_update(user_id, keywords), upsert=True))
+        elif action == "remove":
+            ops.append(UpdateOne({"group_id": group_id}, _remove_update(user_id, keywords)))
+        else:
+            ops.append(UpdateOne({"group_id": group_id}, _remove_update(user_id, keywords, unsubscribe=True)))
+        invalidate_group(group_id)
+
+    if ops:
+        index_collection.bulk_write(ops, ordered=True)
+
+def drop_group_index(group_id: int):
+    """Group is gone (bot removed, migrated away, orphaned)"""
+    index_collection.delete_one({"group_id": group_id})
+    invalidate_group(group_id)
+
+def build_index_document(group_id: int):
+    """Compute a group's index from user_subscriptions (source of truth)"""
+    keywords = defaultdict(set)
+    subscribers = set()
+    cursor = subscription_collection.find(
+        {"group_id": group_id, "subscribed": True},
+        {"_id": 0, "user_id": 1, "keywords": 1}
+    )
+    for sub in cursor:
+        subscribers.add(sub["user_id"])
+        for kw in sub.get("keywords", []):
+            keywords[encode_keyword(normalize_keyword(kw))].add(sub["user_id"])
+
+    return {
+        "keywords": {field: sorted(users) for field, users in keywords.items()},
+        "subscribers": sorted(subscribers),
+    }
+
+def rebuild_group_index(group_id: int):
+    """Repair a single group's index document"""
+    doc = build_index_document(group_id)
+    if not doc["subscribers"]:
+        drop_group_index(group_id)
+        return doc
+
+    index_collection.update_one(
+        {"group_id": group_id},
+        {
+            "$set": {**doc, "updated_at": datetime.utcnow()},
+            "$inc": {"version": 1}
+        },
+        upsert=True
+    )
+    invalidate_group(group_id)
+    return doc
+
+def rebuild_all_indexes():
+    """Rebuild every group's index and drop documents of groups with no subscribers"""
+    group_ids = set(subscription_collection.distinct("group_id", {"subscribed": True}))
+    rebuilt = 0
+    for group_id in group_ids:
+        rebuild_group_index(group_id)
+        rebuilt += 1
+
+    stale = index_collection.delete_many({"group_id": {"$nin": list(group_ids)}})
+    invalidate_all_groups()
+    print(f"[KeywordIndex] Rebuilt {rebuilt} group indexes, removed {stale.deleted_count} stale ones")
+    return {"rebuilt": rebuilt, "removed": stale.deleted_count}
+
+def ensure_keyword_index():
+    """First start after upgrading: build the index from existing subscriptions"""
+    if index_collection.estimated_document_count() == 0 and subscription_collection.find_one({"subscribed": True}):
+        print("[KeywordIndex] No index found - building from user_subscriptions")
+        rebuild_all_indexes()
+
+# -- read path ------------------------------------------------------------
+
+def add_invalidation_listener(listener):
+    """Get told about index changes made in this process (used by shard routing)"""
+    _invalidation_listeners.append(listener)
+
+def invalidate_group(group_id: int, notify=True):
+    _matcher_cache.pop(group_id, None)
+    _warm_documents.pop(group_id, None)
+    if notify:
+        for listener in _invalidation_listeners:
+            listener(group_id)
+
+def invalidate_all_groups(notify=True):
+    _matcher_cache.clear()
+    _warm_documents.clear()
+    if notify:
+        for listener in _invalidation_listeners:
+            listener(None)
+
+def index_global_keywords_changed(user_id: int):
+    """Recompile the matchers of every group this user is subscribed to"""
+    _warm_global_keywords.pop(user_id, None)
+    for group_id in subscription_collection.distinct("group_id", {"user_id": user_id, "subscribed": True}):
+        invalidate_group(group_id)
+
+def matcher_from_document(doc, global_keywords=None) -> KeywordMatcher:
+    keyword_users = defaultdict(set)
+    if doc:
+        for field, users in doc.get("keywords", {}).items():
+            keyword_users[decode_keyword(field)].update(users)
+
+    # Subscribers' global keywords apply to this group too
+    for user_id, keywords in (global_keywords or {}).items():
+        for kw in keywords:
+            keyword_users[kw].add(user_id)
+
+    # Document versions restart after a drop, so they can't identify a keyword set
+    return KeywordMatcher(keyword_users, version=next(_matcher_tokens))
+
+def warm_start(documents, global_keywords):
+    """Seed matcher sources from a snapshot; any invalidation discards a group's entry"""
+    _warm_documents.clear()
+    _warm_documents.update(documents)
+    _warm_global_keywords.clear()
+    _warm_global_keywords.update(global_keywords)
+
+def get_group_matcher(group_id: int) -> KeywordMatcher:
+    """
+    Matcher for a group. A cache miss costs one find_one on the index plus
+    one indexed lookup of the subscribers' global keywords, unless the group
+    is still in the warm-start snapshot.
+    """
+    matcher = _matcher_cache.get(group_id)
+    if matcher is not None:
+        _matcher_cache.move_to_end(group_id)
+        return matcher
+
+    doc = _warm_documents.pop(group_id, None)
+    if doc is not None:
+        global_keywords = {
+            user_id: _warm_global_keywords[user_id]
+            for user_id in doc.get("subscribers", []) if user_id in _warm_global_keywords
+        }
+    else:
+        doc = index_collection.find_one({"group_id": group_id}, {"_id": 0, "keywords": 1, "subscribers": 1, "version": 1})
+        global_keywords = load_global_keywords(doc.get("subscribers", [])) if doc else {}
+    matcher = matcher_from_document(doc, global_keywords)
+
+    _matcher_cache[group_id] = matcher
+    while len(_matcher_cache) > MAX_CACHED_GROUPS:
+        _matcher_cache.popitem(last=False)
+    return matcher
@@ -0,0 +1,86 @@
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from services.matcher import KeywordMatcher
+
+# Matching a near-4096 character post against thousands of keywords takes
+# tens of milliseconds, which would stall every other update on the event
+# loop. Above OFFLOAD_COST_THRESHOLD (message length x keyword count) the
+# match runs in a process pool instead; small messages stay inline.
+#
+# Pool workers keep their own copy of each group's matcher, keyed by the
+# matcher's version token, which is unique per compiled matcher. A task is
+# first sent without the keywords; a worker that doesn't have that version
+# answers MISS and the task is resent with them.
+
+OFFLOAD_COST_THRESHOLD = 8_000_000   # ~5 ms of inline matching
+WORKER_CACHED_GROUPS = 500
+MISS = "miss"
+
+_pool = None
+_pool_workers = 0
+offload_stats = {"inline": 0, "offloaded": 0, "shipped": 0}
+
+# -- pool worker side ---------------------------------------------------------
+
+_worker_matchers = OrderedDict()  # group_id -> KeywordMatcher
+
+def _match_in_worker(group_id, version, text, keyword_users=None):
+    matcher = _worker_matchers.get(group_id)
+    if keyword_users is not None:
+        matcher = KeywordMatcher(keyword_users, version=version)
+        _worker_matchers[group_id] = matcher
+        while len(_worker_matchers) > WORKER_CACHED_GROUPS:
+            _worker_matchers.popitem(last=False)
+    elif matcher is None or matcher.version != version:
+        return MISS
+    _worker_matchers.move_to_end(group_id)
+    return matcher.match(text)
+
+# -- event loop side --------------------------------------------------------
+
+def configure_match_pool(workers: int):
+    """Set the pool size (0 disables offloading); the pool starts on first use"""
+    global _pool_workers
+    _pool_workers = workers
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def shutdown_match_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        print(f"[MatchPool] Stopped ({offload_stats})")
+
+def match_cost(matcher: KeywordMatcher, text: str) -> int:
+    return len(text) * len(matcher)
+
+async def match_message(matcher: KeywordMatcher, group_id: int, text: str):
+    """matcher.match(text), run in the pool when it would block the loop for long"""
+    global _pool
+    if not _pool_workers or match_cost(matcher, text) < OFFLOAD_COST_THRESHOLD:
+        offload_stats["inline"] += 1
+        return matcher.match(text)
+
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(_get_pool(), _match_in_worker, group_id, matcher.version, text)
+        if result == MISS:
+            offload_stats["shipped"] += 1
+            result = await loop.run_in_executor(
+                _get_pool(), _match_in_worker, group_id, matcher.version, text, matcher.keyword_users
+            )
+    except BrokenProcessPool:
+        print("[MatchPool] Pool broke - matching inline and restarting it")
+        _pool = None
+        return matcher.match(text)
+
+    offload_stats["offloaded"] += 1
+    return result
@@ -0,0 +1,273 @@
+import re
+from collections import defaultdict
+
+# Fuzzy keywords are written as `term~` (1 typo) or `term~2` (up to 2 typos)
+FUZZY_PATTERN = re.compile(r"^(\w+)\s*~\s*([12])?$")
+TOKEN_PATTERN = re.compile(r"\w+")
+# Boolean expressions: `python AND remote NOT senior`, `"machine learning" AND remote`.
+# Operators must be uppercase; everything else is lowercased like plain keywords.
+EXPRESSION_TOKEN_PATTERN = re.compile(r'"[^"]*"|\S+')
+OPERATORS = ("AND", "NOT")
+MAX_FUZZY_DISTANCE = 2
+MIN_FUZZY_LENGTH = 4          # shorter words match almost anything with a typo
+MIN_FUZZY_LENGTH_DISTANCE_2 = 7
+MAX_KEYWORD_LENGTH = 100
+
+def parse_fuzzy(spec: str):
+    """Return (term, max_distance) for a fuzzy keyword, or None"""
+    m = FUZZY_PATTERN.match(spec)
+    if not m:
+        return None
+    term = m.group(1)
+    distance = int(m.group(2) or 1)
+    if len(term) < MIN_FUZZY_LENGTH:
+        return None
+    if distance > 1 and len(term) < MIN_FUZZY_LENGTH_DISTANCE_2:
+        distance = 1
+    return term, distance
+
+def normalize_term(term: str) -> str:
+    """Canonical form of a single keyword/phrase (no operators)"""
+    term = " ".join(term.strip().strip('"').lower().split())
+    fuzzy = FUZZY_PATTERN.match(term)
+    if fuzzy:
+        return f"{fuzzy.group(1)}~{fuzzy.group(2) or 1}"
+    return term
+
+def parse_expression(text: str):
+    """
+    Split `a AND b NOT c` into (required terms, excluded terms).
+    Returns None if the text has no operators (i.e. it's a plain keyword).
+    Consecutive words between operators form one phrase.
+    """
+    tokens = EXPRESSION_TOKEN_PATTERN.findall(text.strip())
+    if not any(token in OPERATORS for token in tokens):
+        return None
+
+    required, excluded = [], []
+    operator, words = "AND", []
+
+    def flush():
+        term = normalize_term(" ".join(words))
+        (required if operator == "AND" else excluded).append(term)
+
+    for token in tokens:
+        if token in OPERATORS:
+            flush()
+            operator, words = token, []
+        else:
+            words.append(token.strip('"'))
+    flush()
+    return required, excluded
+
+def format_term(term: str) -> str:
+    return f'"{term}"' if " " in term else term
+
+def format_expression(required, excluded) -> str:
+    text = " AND ".join(format_term(term) for term in required)
+    for term in excluded:
+        text += f" NOT {format_term(term)}"
+    return text
+
+def normalize_keyword(keyword: str) -> str:
+    """Canonical stored form of a keyword or expression as typed by the user"""
+    expression = parse_expression(keyword)
+    if expression:
+        required, excluded = expression
+        # Same terms in any order are the same expression
+        required = sorted(set(required))
+        excluded = sorted(set(excluded))
+        return format_expression(required, excluded)
+    return normalize_term(keyword)
+
+def validate_keyword(keyword: str):
+    """Return an error message for an unusable (normalized) keyword, else None"""
+    if not keyword:
+        return "keywords can't be empty"
+    if len(keyword) > MAX_KEYWORD_LENGTH:
+        return f"keywords can be at most {MAX_KEYWORD_LENGTH} characters"
+    expression = parse_expression(keyword)
+    if expression:
+        required, excluded = expression
+        if not required or "" in required or "" in excluded:
+            return "expressions need a keyword before and after every AND / NOT"
+        terms = required + excluded
+    else:
+        terms = [keyword]
+
+    for term in terms:
+        fuzzy = FUZZY_PATTERN.match(term)
+        if not fuzzy:
+            if "~" in term:
+                return "fuzzy matching (`~`) only works on single words, e.g. `internship~`"
+            continue
+        if len(fuzzy.group(1)) < MIN_FUZZY_LENGTH:
+            return f"fuzzy keywords need at least {MIN_FUZZY_LENGTH} letters"
+        if fuzzy.group(2) == "2" and len(fuzzy.group(1)) < MIN_FUZZY_LENGTH_DISTANCE_2:
+            return f"`~2` needs at least {MIN_FUZZY_LENGTH_DISTANCE_2} letters, use `~` for 1 typo"
+    return None
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein + adjacent swaps), so
+    "intrenship" is 1 edit from "internship". Stops early past `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+            row_min = min(row_min, cur[j])
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+def deletion_variants(word: str, depth: int):
+    """All strings reachable from `word` by deleting up to `depth` characters"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(depth):
+        next_frontier = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                next_frontier.add(w[:i] + w[i + 1:])
+        variants |= next_frontier
+        frontier = next_frontier
+    return variants
+
+class FuzzyIndex:
+    """
+    Deletion-neighbourhood index (SymSpell style) over fuzzy keyword terms.
+
+    Two words are within edit distance d only if they share a string obtained
+    by deleting at most d characters from each. Every term's deletion
+    variants are precomputed, so a message token costs a few dozen dict
+    lookups plus verification of the handful of candidates - independent of
+    how many fuzzy keywords the group has.
+    """
+
+    def __init__(self, terms):
+        # terms: {term: max_distance}
+        self.terms = dict(terms)
+        self.variants = defaultdict(set)
+        for term, distance in self.terms.items():
+            for variant in deletion_variants(term, distance):
+                self.variants[variant].add(term)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def lookup(self, token: str):
+        """Yield terms within their own max distance of `token`"""
+        if len(token) < MIN_FUZZY_LENGTH - 1:
+            return
+        candidates = set()
+        for variant in deletion_variants(token, MAX_FUZZY_DISTANCE):
+            found = self.variants.get(variant)
+            if found:
+                candidates |= found
+        for term in candidates:
+            limit = self.terms[term]
+            if edit_distance(token, term, limit) <= limit:
+                yield term
+
+class KeywordMatcher:
+    """
+    Compiled "who cares about which keyword" view of one group.
+
+    Matching runs in two steps, both independent of the number of users:
+    1. every distinct atomic term (plain keyword, fuzzy `term~N`, or a term
+       used inside an expression) is looked for once;
+    2. each distinct expression (`a AND b NOT c`) is evaluated against the
+       set of atoms found, then fanned out to the users tracking it.
+    """
+
+    def __init__(self, keyword_users, version=0):
+        # keyword -> set of user ids
+        self.keyword_users = {kw: set(users) for kw, users in keyword_users.items() if users}
+        self.version = version
+
+        atoms = set()
+        self.expressions = {}                        # spec -> (required, excluded)
+        self.expressions_by_atom = defaultdict(set)  # required atom -> specs
+        for kw in self.keyword_users:
+            expression = parse_expression(kw)
+            if expression:
+                required, excluded = expression
+                self.expressions[kw] = expression
+                for term in required:
+                    self.expressions_by_atom[term].add(kw)
+                atoms.update(required)
+                atoms.update(excluded)
+            else:
+                atoms.add(kw)
+
+        self.plain = []
+        fuzzy_terms = {}
+        self.fuzzy_specs = defaultdict(list)  # term -> [(spec, max_distance)]
+        for atom in atoms:
+            fuzzy = parse_fuzzy(atom)
+            if fuzzy:
+                term, distance = fuzzy
+                fuzzy_terms[term] = max(distance, fuzzy_terms.get(term, 0))
+                self.fuzzy_specs[term].append((atom, distance))
+            elif atom:
+                self.plain.append(atom)
+        self.fuzzy = FuzzyIndex(fuzzy_terms) if fuzzy_terms else None
+
+    def __len__(self):
+        return len(self.keyword_users)
+
+    def find_atoms(self, text: str):
+        """Single pass over a lowercased message: {atom found: [text to highlight]}"""
+        hits = {}
+        for kw in self.plain:
+            if kw in text:
+                hits[kw] = [kw]
+
+        if self.fuzzy:
+            for token in set(TOKEN_PATTERN.findall(text)):
+                for term in self.fuzzy.lookup(token):
+                    for spec, distance in self.fuzzy_specs[term]:
+                        if edit_distance(token, term, distance) <= distance:
+                            hits.setdefault(spec, []).append(token)
+        return hits
+
+    def find_keywords(self, text: str):
+        """Return {matched keyword: [text to highlight]} for a lowercased message"""
+        hits = self.find_atoms(text)
+
+        # Only expressions with at least one required atom present can match
+        candidates = set()
+        for atom in hits:
+            candidates |= self.expressions_by_atom.get(atom, set())
+
+        for spec in candidates:
+            required, excluded = self.expressions[spec]
+            if all(term in hits for term in required) and not any(term in hits for term in excluded):
+                hits[spec] = [found for term in required for found in hits[term]]
+        return hits
+
+    def match(self, text: str):
+        """
+        Match a message. Returns ({user_id: [matched keywords]},
+        {matched keyword: [text to highlight]}).
+        """
+        text = text.lower()
+        hits = self.find_keywords(text)
+        matches = defaultdict(list)
+        for kw in hits:
+            # Atoms that only appear inside expressions have no users
+            for user_id in self.keyword_users.get(kw, ()):
+                matches[user_id].append(kw)
+        return dict(matches), hits
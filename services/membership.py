@@ -0,0 +1,57 @@
+import asyncio
+from telegram.constants import ChatMemberStatus
+from telegram.error import BadRequest, Forbidden, TelegramError
+from services.cache import AsyncTTLCache
+from services.sharding import forward_membership
+from services.rate_limiter import NOTIFY, lane_args
+
+# Users keep subscriptions after leaving a group; before a notification goes
+# out we make sure the recipient is still in it. Results of get_chat_member
+# are cached and kept current by chat member updates and by join/leave
+# service messages, so a warm fan-out costs no API calls at all.
+
+MEMBERSHIP_TTL = 30 * 60
+MAX_CONCURRENT_MEMBER_LOOKUPS = 8
+
+ACTIVE_STATUSES = (ChatMemberStatus.OWNER, ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.MEMBER)
+
+membership_cache = AsyncTTLCache(ttl=MEMBERSHIP_TTL, max_size=100000)
+_lookup_slots = asyncio.Semaphore(MAX_CONCURRENT_MEMBER_LOOKUPS)
+
+def is_active_member(member) -> bool:
+    if member.status in ACTIVE_STATUSES:
+        return True
+    # Restricted users may or may not still be in the chat
+    return member.status == ChatMemberStatus.RESTRICTED and bool(getattr(member, "is_member", False))
+
+async def _fetch_membership(bot, group_id: int, user_id: int) -> bool:
+    async with _lookup_slots:
+        try:
+            member = await bot.get_chat_member(group_id, user_id, rate_limit_args=lane_args(NOTIFY))
+        except (BadRequest, Forbidden) as e:
+            # User unknown to the chat, or the bot can't see it: don't deliver
+            print(f"[Membership] {user_id} in {group_id}: {e} - treating as non-member")
+            return False
+    return is_active_member(member)
+
+async def is_member(bot, group_id: int, user_id: int) -> bool:
+    """Cached membership check; on network trouble we deliver rather than drop"""
+    try:
+        return await membership_cache.get(
+            (group_id, user_id), lambda: _fetch_membership(bot, group_id, user_id)
+        )
+    except TelegramError as e:  # timeouts, flood control, ...
+        print(f"[Membership] Lookup for {user_id} in {group_id} failed ({e}) - allowing delivery")
+        return True
+
+async def filter_members(bot, group_id: int, user_ids):
+    """Return the subset of user_ids still in the group (lookups run concurrently)"""
+    user_ids = list(user_ids)
+    results = await asyncio.gather(*(is_member(bot, group_id, user_id) for user_id in user_ids))
+    return {user_id for user_id, ok in zip(user_ids, results) if ok}
+
+def record_membership(group_id: int, user_id: int, active: bool, forward: bool = True):
+    """We learned a user's membership from an update; keep the cache (and its shard) current"""
+    membership_cache.set((group_id, user_id), active)
+    if forward:
+        forward_membership(group_id, user_id, active)
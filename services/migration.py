@@ -0,0 +1,157 @@
+from collections import defaultdict
+from datetime import datetime
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import OperationFailure
+from database.connection import get_db
+from services.chat_info import invalidate_chat
+from services.dashboard_cache import invalidate_all_dashboards
+from services.keyword_index import drop_group_index, rebuild_group_index
+
+db = get_db()
+group_collection = db["bot_groups"]
+subscription_collection = db["user_subscriptions"]
+
+# Moving subscriptions from one group id to another (group -> supergroup
+# migration, or a re-added group that got a new id) must not leave two
+# (user_id, group_id) rows behind: they would both be matched. Rows are
+# merged per user instead - keyword lists unioned, one row kept - and the
+# whole move is one bulk write, in a transaction when the deployment
+# supports them. Running it again is a no-op.
+
+REPAIR_BATCH_SIZE = 500
+TRANSACTIONS_UNSUPPORTED = 20  # IllegalOperation: standalone server
+
+def merge_rows(rows, group_id, group_name=None):
+    """
+    Merge one user's subscription rows into the row to keep.
+    Returns (keep_id, $set fields, [_ids to delete]).
+    """
+    # Prefer a row that already has the target id, then the oldest
+    rows = sorted(rows, key=lambda row: (row["group_id"] != group_id, row["_id"]))
+    keep = rows[0]
+
+    keywords = []
+    for row in rows:
+        for kw in row.get("keywords", []):
+            if kw not in keywords:
+                keywords.append(kw)
+
+    fields = {"group_id": group_id, "keywords": keywords}
+    if group_name:
+        fields["group_name"] = group_name
+    # Notifications stay on if they were on for any of the rows
+    fields["subscribed"] = any(row.get("subscribed", False) for row in rows)
+    match_times = [row["last_match_time"] for row in rows if row.get("last_match_time")]
+    if match_times:
+        fields["last_match_time"] = max(match_times)
+    return keep["_id"], fields, [row["_id"] for row in rows[1:]]
+
+def build_merge_operations(rows, group_id, group_name=None):
+    by_user = defaultdict(list)
+    for row in rows:
+        by_user[row["user_id"]].append(row)
+
+    deletes, updates = [], []
+    for user_rows in by_user.values():
+        keep_id, fields, drop_ids = merge_rows(user_rows, group_id, group_name)
+        unset = {"muted_reason": "", "muted_at": ""} if fields["subscribed"] else {}
+        update = {"$set": fields}
+        if unset:
+            update["$unset"] = unset
+        updates.append(UpdateOne({"_id": keep_id}, update))
+        deletes.extend(DeleteOne({"_id": _id}) for _id in drop_ids)
+    # Deletes first so the kept row never collides on (user_id, group_id)
+    return deletes + updates
+
+def run_in_transaction(work):
+    """Run work(session) in a transaction, or without one on a standalone server"""
+    try:
+        with db.client.start_session() as session:
+            return session.with_transaction(work)
+    except OperationFailure as e:
+        if e.code != TRANSACTIONS_UNSUPPORTED:
+            raise
+        return work(None)
+
+def migrate_group(old_ids, new_id: int, new_group=None):
+    """
+    Move all subscriptions of `old_ids` to `new_id`, merging per user, and
+    replace the old bot_groups records by `new_group` (fields for new_id).
+    Returns the number of subscription rows after the merge.
+    """
+    old_ids = [old_id for old_id in old_ids if old_id != new_id]
+    if not old_ids:
+        return 0
+    group_name = new_group.get("group_name") if new_group else None
+
+    def work(session):
+        rows = list(subscription_collection.find(
+            {"group_id": {"$in": old_ids + [new_id]}},
+            {"_id": 1, "user_id": 1, "group_id": 1, "keywords": 1, "subscribed": 1, "last_match_time": 1},
+            session=session
+        ))
+        ops = build_merge_operations(rows, new_id, group_name)
+        if ops:
+            subscription_collection.bulk_write(ops, ordered=True, session=session)
+        if new_group:
+            group_collection.update_one(
+                {"group_id": new_id},
+                {"$set": {**new_group, "group_id": new_id, "last_updated": datetime.utcnow()}},
+                upsert=True, session=session
+            )
+        group_collection.delete_many({"group_id": {"$in": old_ids}}, session=session)
+        return len({row["user_id"] for row in rows})
+
+    kept = run_in_transaction(work)
+
+    # Caches and the keyword index follow the database
+    for old_id in old_ids:
+        invalidate_chat(old_id)
+        drop_group_index(old_id)
+    rebuild_group_index(new_id)
+    invalidate_all_dashboards()
+    print(f"[Migration] {old_ids} -> {new_id}: {kept} subscriptions")
+    return kept
+
+def find_duplicate_subscriptions(batch_size=REPAIR_BATCH_SIZE):
+    """Yield batches of (user_id, group_id) keys that have more than one row"""
+    cursor = subscription_collection.aggregate([
+        {"$group": {"_id": {"user_id": "$user_id", "group_id": "$group_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    batch = []
+    for doc in cursor:
+        batch.append((doc["_id"]["user_id"], doc["_id"]["group_id"]))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def repair_duplicate_subscriptions(batch_size=REPAIR_BATCH_SIZE):
+    """Merge existing duplicate (user_id, group_id) rows, one bulk write per batch"""
+    merged = removed = 0
+    touched_groups = set()
+    for batch in find_duplicate_subscriptions(batch_size):
+        rows = list(subscription_collection.find({
+            "$or": [{"user_id": user_id, "group_id": group_id} for user_id, group_id in batch]
+        }))
+        by_group = defaultdict(list)
+        for row in rows:
+            by_group[row["group_id"]].append(row)
+
+        ops = []
+        for group_id, group_rows in by_group.items():
+            ops.extend(build_merge_operations(group_rows, group_id))
+            touched_groups.add(group_id)
+        if ops:
+            result = subscription_collection.bulk_write(ops, ordered=True)
+            merged += len(batch)
+            removed += result.deleted_count
+        print(f"[Repair] Merged {merged} duplicate subscriptions so far ({removed} rows removed)")
+
+    for group_id in touched_groups:
+        rebuild_group_index(group_id)
+    if touched_groups:
+        invalidate_all_dashboards()
+    return {"merged": merged, "removed": removed, "groups": len(touched_groups)}
@@ -0,0 +1,260 @@
+import heapq
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from pymongo import InsertOne
+from telegram.helpers import escape_markdown
+from database.connection import get_db
+from services.delivery import deliver_notification, DEAD
+
+db = get_db()
+settings_collection = db["user_settings"]
+deferred_collection = db["deferred_deliveries"]
+
+# Quiet hours: {user_id, quiet: {start: "23:00", end: "07:00", tz: "Europe/Berlin"}}
+# in user_settings. Matches inside the window are stored in
+# deferred_deliveries with release_at = the window's end (UTC) and sent as
+# one digest message then.
+#
+# Releases are driven by a single repeating job and an in-memory heap of
+# (release_at, user_id), not a job per user. The heap is rebuilt from Mongo
+# periodically, which also picks up items deferred by shard workers and
+# survives restarts.
+
+TIME_PATTERN = re.compile(r"^([01]?\d|2[0-3]):?([0-5]\d)$")
+SETTINGS_CACHE_TTL = 300
+DIGEST_POLL_INTERVAL = 30
+DIGEST_RESYNC_INTERVAL = 300
+DIGEST_MAX_ITEMS = 25
+DIGEST_MAX_KEYWORDS = 5
+DIGEST_LENGTH_BUDGET = 3800  # Leave buffer under Telegram’s 4096 limit
+DIGEST_DEAD_RETRY = timedelta(hours=6)
+DIGEST_MAX_ATTEMPTS = 3
+EXCERPT_LENGTH = 160
+
+_settings_cache = {}   # user_id -> (expires_at, quiet settings or None)
+_release_heap = []     # (release_at, user_id)
+_scheduled = {}        # user_id -> earliest release_at on the heap
+_last_resync = 0.0
+
+# -- settings ---------------------------------------------------------------
+
+def parse_clock(value: str):
+    """'23:00' / '2300' / '7:30' -> 'HH:MM', or None"""
+    m = TIME_PATTERN.match(value.strip())
+    if not m:
+        return None
+    return f"{int(m.group(1)):02d}:{m.group(2)}"
+
+def parse_timezone(name: str):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+def set_quiet_hours(user_id: int, start: str, end: str, tz: str):
+    settings_collection.update_one(
+        {"user_id": user_id},
+        {"$set": {"quiet": {"start": start, "end": end, "tz": tz}, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    _settings_cache.pop(user_id, None)
+
+def clear_quiet_hours(user_id: int):
+    settings_collection.update_one(
+        {"user_id": user_id},
+        {"$unset": {"quiet": ""}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    _settings_cache.pop(user_id, None)
+
+def get_quiet_hours(user_id: int):
+    return load_quiet_hours([user_id]).get(user_id)
+
+def load_quiet_hours(user_ids):
+    """{user_id: quiet settings} for users with quiet hours; one query for uncached users"""
+    now = time.monotonic()
+    result = {}
+    missing = []
+    for user_id in user_ids:
+        entry = _settings_cache.get(user_id)
+        if entry and entry[0] > now:
+            if entry[1]:
+                result[user_id] = entry[1]
+        else:
+            missing.append(user_id)
+
+    if missing:
+        found = {
+            doc["user_id"]: doc["quiet"]
+            for doc in settings_collection.find(
+                {"user_id": {"$in": missing}, "quiet": {"$exists": True}},
+                {"_id": 0, "user_id": 1, "quiet": 1}
+            )
+        }
+        for user_id in missing:
+            _settings_cache[user_id] = (now + SETTINGS_CACHE_TTL, found.get(user_id))
+        result.update(found)
+    return result
+
+def quiet_window_end(quiet, now=None):
+    """If `now` (naive UTC) is inside the quiet window, return its end (naive UTC), else None"""
+    tz = parse_timezone(quiet["tz"])
+    if tz is None:
+        return None
+    now = now or datetime.utcnow()
+    local = now.replace(tzinfo=timezone.utc).astimezone(tz)
+    start = datetime.strptime(quiet["start"], "%H:%M").time()
+    end = datetime.strptime(quiet["end"], "%H:%M").time()
+    current = local.time()
+
+    if start < end:
+        inside = start <= current < end
+        end_date = local.date()
+    else:  # window crosses midnight
+        inside = current >= start or current < end
+        end_date = local.date() + timedelta(days=1) if current >= start else local.date()
+    if not inside:
+        return None
+
+    end_local = datetime.combine(end_date, end, tzinfo=tz)
+    return end_local.astimezone(timezone.utc).replace(tzinfo=None)
+
+# -- deferring --------------------------------------------------------------
+
+def defer_notifications(items):
+    """Store matches for later; items are dicts with user_id, release_at and the alert fields"""
+    if not items:
+        return
+    deferred_collection.bulk_write([InsertOne(item) for item in items], ordered=False)
+    for item in items:
+        schedule_release(item["user_id"], item["release_at"])
+
+def schedule_release(user_id: int, release_at: datetime):
+    current = _scheduled.get(user_id)
+    if current is not None and current <= release_at:
+        return
+    _scheduled[user_id] = release_at
+    heapq.heappush(_release_heap, (release_at, user_id))
+
+def resync_release_heap():
+    """Rebuild the heap from Mongo: earliest pending release per user"""
+    _release_heap.clear()
+    _scheduled.clear()
+    for row in deferred_collection.aggregate([
+        {"$group": {"_id": "$user_id", "release_at": {"$min": "$release_at"}}}
+    ]):
+        _scheduled[row["_id"]] = row["release_at"]
+        _release_heap.append((row["release_at"], row["_id"]))
+    heapq.heapify(_release_heap)
+
+def clear_deferred(user_id: int):
+    deferred_collection.delete_many({"user_id": user_id})
+    _scheduled.pop(user_id, None)
+
+# -- releasing --------------------------------------------------------------
+
+def render_digest_item(item):
+    keywords = ", ".join(f"`{kw}`" for kw in item["keywords"][:DIGEST_MAX_KEYWORDS])
+    if len(item["keywords"]) > DIGEST_MAX_KEYWORDS:
+        keywords += f" +{len(item['keywords']) - DIGEST_MAX_KEYWORDS}"
+    excerpt = item.get("excerpt", "")
+    if len(excerpt) > EXCERPT_LENGTH:
+        excerpt = excerpt[:EXCERPT_LENGTH] + "…"
+    line = f"👥 *{escape_markdown(item['group_name'])}* · {keywords}\n{escape_markdown(excerpt)}"
+    if item.get("link"):
+        line += f" [View]({item['link']})"
+    return line
+
+def build_digest(items, budget=DIGEST_LENGTH_BUDGET):
+    """
+    Render a digest as one or more messages of at most `budget` characters.
+    Returns [(text, items covered by that message)].
+    """
+    shown, rest = items[:DIGEST_MAX_ITEMS], items[DIGEST_MAX_ITEMS:]
+    messages = []
+    lines = [f"🌅 *Quiet hours digest* – {len(items)} match{'es' if len(items) != 1 else ''}"]
+    covered = []
+    length = len(lines[0])
+
+    def flush():
+        nonlocal lines, covered, length
+        messages.append(("\n\n".join(lines), covered))
+        lines = ["🌅 *Quiet hours digest* (continued)"]
+        covered = []
+        length = len(lines[0])
+
+    for item in shown:
+        line = render_digest_item(item)
+        if covered and length + len(line) + 2 > budget:
+            flush()
+        lines.append(line)
+        covered.append(item)
+        length += len(line) + 2
+    if rest:
+        footer = f"_…and {len(rest)} more_"
+        if length + len(footer) + 2 > budget:
+            flush()
+        lines.append(footer)
+        covered.extend(rest)
+    if covered:
+        messages.append(("\n\n".join(lines), covered))
+    return messages
+
+def postpone_deferred(ids, now: datetime):
+    """Keep undeliverable digest items for a later attempt, up to DIGEST_MAX_ATTEMPTS"""
+    deferred_collection.update_many(
+        {"_id": {"$in": ids}},
+        {"$set": {"release_at": now + DIGEST_DEAD_RETRY}, "$inc": {"digest_attempts": 1}}
+    )
+    # Given up on: the text is in the delivery dead letters
+    deferred_collection.delete_many({"_id": {"$in": ids}, "digest_attempts": {"$gte": DIGEST_MAX_ATTEMPTS}})
+
+async def release_user_digest(bot, user_id: int, now: datetime):
+    items = list(
+        deferred_collection.find({"user_id": user_id, "release_at": {"$lte": now}})
+        .sort("matched_at", 1)
+    )
+    if not items:
+        return False
+
+    messages = build_digest(items)
+    for i, (text, covered) in enumerate(messages):
+        # Failed sends go to the delivery retry queue like any notification;
+        # only dead-lettered parts stay deferred
+        outcome = await deliver_notification(bot, user_id, text)
+        if outcome == DEAD:
+            postpone_deferred([item["_id"] for _, rest in messages[i:] for item in rest], now)
+            return False
+        deferred_collection.delete_many({"_id": {"$in": [item["_id"] for item in covered]}})
+    return True
+
+async def release_due_digests(context):
+    """JobQueue callback: send every digest whose quiet window has ended"""
+    global _last_resync
+    if time.monotonic() - _last_resync >= DIGEST_RESYNC_INTERVAL:
+        resync_release_heap()
+        _last_resync = time.monotonic()
+
+    now = datetime.utcnow()
+    released = 0
+    while _release_heap and _release_heap[0][0] <= now:
+        release_at, user_id = heapq.heappop(_release_heap)
+        if _scheduled.get(user_id) != release_at:
+            continue  # superseded entry
+        del _scheduled[user_id]
+        try:
+            if await release_user_digest(context.bot, user_id, now):
+                released += 1
+        except Exception as e:
+            print(f"[QuietHours] Failed to release digest for {user_id}: {e}")
+
+        # Items for a later window stay pending
+        pending = deferred_collection.find_one(
+            {"user_id": user_id}, {"release_at": 1}, sort=[("release_at", 1)]
+        )
+        if pending:
+            schedule_release(user_id, pending["release_at"])
+
+    if released:
+        print(f"[QuietHours] Released {released} digests")
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from collections import deque
+from telegram.ext import BaseRateLimiter
+
+# Outgoing Bot API calls are scheduled in priority lanes so that button
+# presses and command replies never wait behind a notification fan-out.
+# Calls are tagged with rate_limit_args={"lane": ...}; untagged calls (every
+# reply/edit made through PTB shortcuts) are interactive.
+
+INTERACTIVE = "interactive"
+NOTIFY = "notify"
+BACKGROUND = "background"
+
+LANES = (INTERACTIVE, NOTIFY, BACKGROUND)  # highest priority first
+LANE_CONCURRENCY = {INTERACTIVE: 16, NOTIFY: 8, BACKGROUND: 2}
+MAX_IN_FLIGHT = 20
+# A request that has waited this long goes next regardless of its lane
+STARVATION_SECONDS = 5.0
+LATENCY_SAMPLES = 1000
+LANE_STATS_INTERVAL = 600
+# Telegram's overall message limit for a bot, shared by all shard processes
+GLOBAL_SEND_RATE = 30
+SEND_BURST = 30
+SEND_ENDPOINTS = ("send", "edit", "copy", "forward")
+
+def lane_args(lane: str):
+    """rate_limit_args for a Bot API call in `lane`"""
+    return {"lane": lane}
+
+class SharedSendBucket:
+    """
+    Token bucket in shared memory, so the front process and every shard
+    worker together stay under GLOBAL_SEND_RATE. Pass it to spawned
+    processes as a Process argument.
+    """
+
+    def __init__(self, ctx, rate=GLOBAL_SEND_RATE, burst=SEND_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._lock = ctx.Lock()
+        self._tokens = ctx.RawValue("d", burst)
+        self._updated = ctx.RawValue("d", time.time())
+
+    def _take(self):
+        """Take a token; returns 0, or the seconds until one is available"""
+        with self._lock:
+            now = time.time()
+            tokens = min(self.burst, self._tokens.value + (now - self._updated.value) * self.rate)
+            self._updated.value = now
+            if tokens >= 1:
+                self._tokens.value = tokens - 1
+                return 0
+            self._tokens.value = tokens
+            return (1 - tokens) / self.rate
+
+    async def acquire(self):
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+class PriorityRateLimiter(BaseRateLimiter):
+    def __init__(self, send_bucket=None):
+        self.send_bucket = send_bucket  # SharedSendBucket when sharded
+        self._waiting = {lane: deque() for lane in LANES}  # (enqueued_at, future)
+        self._in_flight = {lane: 0 for lane in LANES}
+        self._total_in_flight = 0
+        self._samples = {lane: {"wait": deque(maxlen=LATENCY_SAMPLES), "total": deque(maxlen=LATENCY_SAMPLES)} for lane in LANES}
+        self._counts = {lane: 0 for lane in LANES}
+        self._promoted = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        print(f"[Lanes] {format_lane_stats(self.stats())}")
+
+    def _has_capacity(self, lane):
+        return self._total_in_flight < MAX_IN_FLIGHT and self._in_flight[lane] < LANE_CONCURRENCY[lane]
+
+    def _next_lane(self):
+        now = time.monotonic()
+        # Starvation guard: the oldest request past the limit wins
+        starved = [
+            lane for lane in LANES
+            if self._waiting[lane] and self._has_capacity(lane)
+            and now - self._waiting[lane][0][0] >= STARVATION_SECONDS
+        ]
+        if starved:
+            lane = min(starved, key=lambda lane: self._waiting[lane][0][0])
+            if lane != INTERACTIVE:
+                self._promoted += 1
+            return lane
+        for lane in LANES:
+            if self._waiting[lane] and self._has_capacity(lane):
+                return lane
+        return None
+
+    def _dispatch(self):
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                return
+            _, future = self._waiting[lane].popleft()
+            if future.done():  # caller was cancelled while waiting
+                continue
+            self._in_flight[lane] += 1
+            self._total_in_flight += 1
+            future.set_result(None)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        lane = (rate_limit_args or {}).get("lane", INTERACTIVE)
+        if lane not in self._waiting:
+            lane = INTERACTIVE
+
+        enqueued = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[lane].append((enqueued, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(lane)  # slot was granted just before cancellation
+            raise
+
+        started = None
+        try:
+            if self.send_bucket is not None and endpoint.startswith(SEND_ENDPOINTS):
+                await self.send_bucket.acquire()
+            started = time.monotonic()
+            return await callback(*args, **kwargs)
+        finally:
+            finished = time.monotonic()
+            self._samples[lane]["wait"].append((started or finished) - enqueued)
+            self._samples[lane]["total"].append(finished - enqueued)
+            self._counts[lane] += 1
+            self._release(lane)
+
+    def _release(self, lane):
+        self._in_flight[lane] -= 1
+        self._total_in_flight -= 1
+        self._dispatch()
+
+    def stats(self):
+        """Per-lane call counts, queue depth and wait/total latency percentiles (ms)"""
+        result = {}
+        for lane in LANES:
+            entry = {"calls": self._counts[lane], "queued": len(self._waiting[lane]), "in_flight": self._in_flight[lane]}
+            for kind, samples in self._samples[lane].items():
+                ordered = sorted(samples)
+                if ordered:
+                    entry[f"{kind}_p50_ms"] = round(ordered[len(ordered) // 2] * 1000, 1)
+                    entry[f"{kind}_p95_ms"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1)
+            result[lane] = entry
+        result["promoted"] = self._promoted
+        return result
+
+def format_lane_stats(stats):
+    parts = []
+    for lane in LANES:
+        entry = stats[lane]
+        parts.append(
+            f"{lane}: {entry['calls']} calls, wait p50/p95 "
+            f"{entry.get('wait_p50_ms', 0)}/{entry.get('wait_p95_ms', 0)} ms, "
+            f"total p95 {entry.get('total_p95_ms', 0)} ms"
+        )
+    return "; ".join(parts) + f"; promoted {stats['promoted']}"
+
+async def report_lane_stats(context):
+    """JobQueue callback: log lane latencies"""
+    limiter = context.bot.rate_limiter
+    if isinstance(limiter, PriorityRateLimiter):
+        print(f"[Lanes] {format_lane_stats(limiter.stats())}")
@@ -0,0 +1,206 @@
+import asyncio
+import multiprocessing
+import queue
+from types import SimpleNamespace
+from services.keyword_index import add_invalidation_listener
+from services.rate_limiter import PriorityRateLimiter, SharedSendBucket
+
+# Optional multi-process mode (SHARD_WORKERS > 1). The front process keeps
+# receiving updates and handling private-chat commands; text messages from
+# groups are routed by group_id to one of N worker processes. Each worker has
+# its own Bot, Mongo client and matcher cache, so a group's matcher only
+# lives in the shard that owns it. Keyword changes made on the front are
+# forwarded to the owning shard as cache invalidations.
+#
+# Every process has its own Bot, so the global message rate is enforced by
+# one SharedSendBucket used by all of their rate limiters.
+
+WORKER_CONCURRENCY = 32  # in-flight messages per worker
+STOP = None              # sentinel on a shard queue
+
+_router = None
+
+def shard_for(group_id: int, shards: int) -> int:
+    """Stable shard index for a group (same on every start)"""
+    return abs(group_id) % shards
+
+class ShardRouter:
+    def __init__(self, shards: int, token: str):
+        self.shards = shards
+        self.token = token
+        self.ctx = multiprocessing.get_context("spawn")
+        self.queues = [self.ctx.Queue() for _ in range(shards)]
+        self.processes = [None] * shards
+        self.dispatched = [0] * shards
+        self.send_bucket = SharedSendBucket(self.ctx)
+
+    def start(self):
+        for index in range(self.shards):
+            self._spawn(index)
+        add_invalidation_listener(self.invalidate)
+        print(f"[Shards] Started {self.shards} workers")
+
+    def _spawn(self, index):
+        process = self.ctx.Process(
+            target=run_shard_worker,
+            args=(index, self.queues, self.token, self.send_bucket),
+            name=f"shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+
+    def _send(self, index, item):
+        if not self.processes[index].is_alive():
+            # A crashed worker only loses its cache; restart it
+            print(f"[Shards] Worker {index} died (exit {self.processes[index].exitcode}) - restarting")
+            self._spawn(index)
+        self.queues[index].put(item)
+
+    def dispatch(self, update):
+        index = shard_for(update.effective_chat.id, self.shards)
+        self.dispatched[index] += 1
+        self._send(index, ("message", update.to_dict()))
+
+    def invalidate(self, group_id):
+        """Keyword index listener: group_id changed, or None for everything"""
+        if group_id is None:
+            for index in range(self.shards):
+                self._send(index, ("invalidate", None))
+        else:
+            self._send(shard_for(group_id, self.shards), ("invalidate", group_id))
+
+    def membership(self, group_id, user_id, active):
+        self._send(shard_for(group_id, self.shards), ("member", (group_id, user_id, active)))
+
+    def stop(self, timeout=30):
+        """Let every worker finish its queue, then exit"""
+        for index in range(self.shards):
+            if self.processes[index].is_alive():
+                self.queues[index].put(STOP)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        print(f"[Shards] Stopped workers (dispatched per shard: {self.dispatched})")
+
+def start_sharding(shards: int, token: str, limiter=None):
+    """Start the workers; `limiter` is the front bot's rate limiter, which joins the shared send rate"""
+    global _router
+    _router = ShardRouter(shards, token)
+    if isinstance(limiter, PriorityRateLimiter):
+        limiter.send_bucket = _router.send_bucket
+    _router.start()
+    return _router
+
+def stop_sharding():
+    global _router
+    if _router:
+        _router.stop()
+        _router = None
+
+def dispatch_to_shard(update) -> bool:
+    """Hand a group text message (new or edited) to its shard; False if it should be handled here"""
+    message = update.message or update.edited_message
+    if _router is None or not message or not message.text:
+        return False
+    _router.dispatch(update)
+    return True
+
+def forward_membership(group_id: int, user_id: int, active: bool):
+    """Membership learned on the front process is needed by the group's shard"""
+    if _router is not None:
+        _router.membership(group_id, user_id, active)
+
+# -- worker process ---------------------------------------------------------
+
+def run_shard_worker(index: int, queues, token: str, send_bucket=None):
+    asyncio.run(_shard_main(index, queues, token, send_bucket))
+
+async def _shard_main(index, queues, token, send_bucket):
+    # Imported here: handlers import this module for dispatch_to_shard
+    from telegram import Update
+    from telegram.ext import ExtBot
+    from handlers.message_handlers import process_keyword_matching
+    from services.keyword_index import invalidate_group, invalidate_all_groups
+    from services.snapshot import load_snapshot
+    from services.membership import record_membership
+    from services.history import flush_history, flush_history_now, HISTORY_FLUSH_INTERVAL
+    from services.stats import flush_stats, flush_stats_now, STATS_FLUSH_INTERVAL
+    from services.edit_tracking import report_edit_tracking, EDIT_STATS_INTERVAL
+    from config import SNAPSHOT_PATH
+
+    inbox = queues[index]
+
+    def forward_invalidation(group_id):
+        # e.g. muting a blocked recipient touches groups owned by other shards
+        targets = range(len(queues)) if group_id is None else [shard_for(group_id, len(queues))]
+        for target in targets:
+            if target != index:
+                queues[target].put(("invalidate", group_id))
+    add_invalidation_listener(forward_invalidation)
+
+    if SNAPSHOT_PATH:
+        # Only this shard's groups; the front process owns saving the file
+        load_snapshot(group_filter=lambda group_id: shard_for(group_id, len(queues)) == index, keep_state=False)
+
+    bot = ExtBot(token, rate_limiter=PriorityRateLimiter(send_bucket))
+    await bot.initialize()
+    context = SimpleNamespace(bot=bot)
+    slots = asyncio.Semaphore(WORKER_CONCURRENCY)
+    pending = set()
+    loop = asyncio.get_running_loop()
+    print(f"[Shard {index}] Ready")
+
+    async def flush_periodically():
+        # No JobQueue in a worker; write-behind buffers are flushed from here
+        elapsed = 0
+        while True:
+            await asyncio.sleep(HISTORY_FLUSH_INTERVAL)
+            elapsed += HISTORY_FLUSH_INTERVAL
+            await flush_history()
+            if elapsed % STATS_FLUSH_INTERVAL == 0:
+                await flush_stats()
+            if elapsed % EDIT_STATS_INTERVAL == 0:
+                await report_edit_tracking(context)
+    flusher = asyncio.create_task(flush_periodically())
+
+    async def handle(data):
+        try:
+            await process_keyword_matching(Update.de_json(data, bot), context)
+        except Exception as e:
+            print(f"[Shard {index}] Failed to process message: {e}")
+        finally:
+            slots.release()
+
+    while True:
+        try:
+            item = await loop.run_in_executor(None, inbox.get, True, 1)
+        except queue.Empty:
+            continue
+        if item is STOP:
+            break
+
+        kind, payload = item
+        if kind == "invalidate":
+            if payload is None:
+                invalidate_all_groups(notify=False)
+            else:
+                invalidate_group(payload, notify=False)
+            continue
+        if kind == "member":
+            record_membership(*payload, forward=False)
+            continue
+
+        await slots.acquire()
+        task = asyncio.create_task(handle(payload))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    if pending:
+        await asyncio.wait(pending)
+    flusher.cancel()
+    flush_history_now()
+    flush_stats_now()
+    await bot.shutdown()
+    print(f"[Shard {index}] Stopped")
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import pickle
+import time
+from datetime import datetime, timedelta
+from database.connection import get_db
+from config import DB_NAME, SNAPSHOT_PATH
+from services.keyword_index import warm_start
+
+db = get_db()
+index_collection = db["group_keyword_index"]
+global_keyword_collection = db["user_global_keywords"]
+
+# On-disk copy of every group's index document plus users' global keywords,
+# so a restart can compile matchers without a Mongo round trip per group.
+# Next to the data we keep high-water marks (max updated_at seen); on load
+# only documents changed since then are fetched. Written by this process
+# only - it is a local cache, never shipped anywhere.
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_INTERVAL = 900  # seconds between periodic saves
+# updated_at comes from each writer's clock; re-read a margin before the mark
+CATCHUP_SLACK = timedelta(minutes=5)
+
+INDEX_FIELDS = {"_id": 0, "group_id": 1, "keywords": 1, "subscribers": 1, "version": 1, "updated_at": 1}
+
+_state = None  # {"groups": {group_id: doc}, "global_keywords": {...}, "index_hwm", "global_hwm"}
+
+def _empty_state():
+    return {"groups": {}, "global_keywords": {}, "index_hwm": None, "global_hwm": None}
+
+def _read_file(path):
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[Snapshot] Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+    if data.get("format") != SNAPSHOT_FORMAT or data.get("db") != DB_NAME:
+        print("[Snapshot] Snapshot is from another format/database - ignoring it")
+        return None
+    return data["state"]
+
+def catch_up(state):
+    """Apply index/global keyword changes made since the state's high-water marks"""
+    query = {}
+    if state["index_hwm"]:
+        query = {"updated_at": {"$gte": state["index_hwm"] - CATCHUP_SLACK}}
+    changed = 0
+    for doc in index_collection.find(query, INDEX_FIELDS):
+        state["groups"][doc["group_id"]] = doc
+        if doc.get("updated_at") and (state["index_hwm"] is None or doc["updated_at"] > state["index_hwm"]):
+            state["index_hwm"] = doc["updated_at"]
+        changed += 1
+
+    # Deleted index documents leave no updated_at behind
+    live = set(index_collection.distinct("group_id"))
+    removed = [group_id for group_id in state["groups"] if group_id not in live]
+    for group_id in removed:
+        del state["groups"][group_id]
+
+    query = {}
+    if state["global_hwm"]:
+        query = {"updated_at": {"$gte": state["global_hwm"] - CATCHUP_SLACK}}
+    for doc in global_keyword_collection.find(query, {"_id": 0, "user_id": 1, "keywords": 1, "updated_at": 1}):
+        if doc.get("keywords"):
+            state["global_keywords"][doc["user_id"]] = doc["keywords"]
+        else:
+            state["global_keywords"].pop(doc["user_id"], None)
+        if doc.get("updated_at") and (state["global_hwm"] is None or doc["updated_at"] > state["global_hwm"]):
+            state["global_hwm"] = doc["updated_at"]
+
+    return changed, len(removed)
+
+def load_snapshot(path=SNAPSHOT_PATH, group_filter=None, keep_state=True):
+    """
+    Load the snapshot (or build state from Mongo if there is none), catch up,
+    and hand the documents to the keyword index as warm matcher sources.
+    `group_filter` restricts what is handed over (sharded mode). Only the
+    process that saves the snapshot needs `keep_state`.
+    """
+    global _state
+    started = time.monotonic()
+    state = _read_file(path)
+    source = "snapshot"
+    if state is None:
+        state, source = _empty_state(), "full scan"
+
+    changed, removed = catch_up(state)
+    if keep_state:
+        _state = state
+
+    groups = state["groups"]
+    if group_filter:
+        groups = {group_id: doc for group_id, doc in groups.items() if group_filter(group_id)}
+    warm_start(groups, state["global_keywords"] if groups else {})
+
+    print(
+        f"[Snapshot] Warm start from {source}: {len(groups)} groups "
+        f"({changed} changed, {removed} removed since snapshot) in {time.monotonic() - started:.2f}s"
+    )
+
+def save_snapshot(path=SNAPSHOT_PATH):
+    """Catch up and atomically rewrite the snapshot file"""
+    global _state
+    if _state is None:
+        _state = _empty_state()
+    catch_up(_state)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(
+            {"format": SNAPSHOT_FORMAT, "db": DB_NAME, "saved_at": datetime.utcnow(), "state": _state},
+            f, protocol=pickle.HIGHEST_PROTOCOL
+        )
+    os.replace(tmp_path, path)
+    print(f"[Snapshot] Saved {len(_state['groups'])} groups to {path}")
+
+async def save_snapshot_job(context):
+    """JobQueue callback; the Mongo reads and file write run off the event loop"""
+    try:
+        await asyncio.to_thread(save_snapshot)
+    except Exception as e:
+        print(f"[Snapshot] Save failed: {e}")
@@ -0,0 +1,105 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from database.connection import get_db
+from services.keyword_index import encode_keyword
+
+db = get_db()
+stats_collection = db["match_stats"]
+
+# Pre-aggregated counters in hour and day buckets, one document per
+# (scope, owner, granularity, bucket):
+#   {_id, scope: "user"|"group", owner, granularity: "hour"|"day", bucket,
+#    messages, matches, keywords: {<encoded keyword>: n}, groups: {<group_id>: n},
+#    expires_at}
+# The message path only bumps in-memory counters; they are flushed as $inc
+# upserts in one bulk_write. /stats reads these buckets, never raw data.
+
+STATS_FLUSH_INTERVAL = 60
+BUCKET_RETENTION = {"hour": timedelta(days=7), "day": timedelta(days=90)}
+USER = "user"
+GROUP = "group"
+
+_counters = defaultdict(lambda: defaultdict(int))  # bucket key -> {field: increment}
+
+def bucket_start(now: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return now.replace(minute=0, second=0, microsecond=0)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _bump(scope, owner, field, amount=1, now=None):
+    now = now or datetime.utcnow()
+    for granularity in BUCKET_RETENTION:
+        _counters[(scope, owner, granularity, bucket_start(now, granularity))][field] += amount
+
+def count_message(group_id: int):
+    _bump(GROUP, group_id, "messages")
+
+def count_matches(group_id: int, user_keywords):
+    """user_keywords: {user_id: [matched keywords]} for one message"""
+    if not user_keywords:
+        return
+    now = datetime.utcnow()
+    _bump(GROUP, group_id, "matches", len(user_keywords), now)
+    for user_id, keywords in user_keywords.items():
+        _bump(USER, user_id, "matches", 1, now)
+        _bump(USER, user_id, f"groups.{group_id}", 1, now)
+        for kw in keywords:
+            field = f"keywords.{encode_keyword(kw)}"
+            _bump(USER, user_id, field, 1, now)
+            _bump(GROUP, group_id, field, 1, now)
+
+def _take_operations():
+    global _counters
+    counters, _counters = _counters, defaultdict(lambda: defaultdict(int))
+    ops = []
+    for (scope, owner, granularity, bucket), increments in counters.items():
+        ops.append(UpdateOne(
+            {"_id": f"{scope}:{owner}:{granularity}:{bucket:%Y%m%d%H}"},
+            {
+                "$inc": dict(increments),
+                "$setOnInsert": {
+                    "scope": scope,
+                    "owner": owner,
+                    "granularity": granularity,
+                    "bucket": bucket,
+                    "expires_at": bucket + BUCKET_RETENTION[granularity],
+                },
+            },
+            upsert=True
+        ))
+    return ops
+
+def _write(ops):
+    try:
+        stats_collection.bulk_write(ops, ordered=False)
+    except Exception as e:
+        # Counters are best effort; losing one interval is acceptable
+        print(f"[Stats] Failed to flush {len(ops)} buckets: {e}")
+
+async def flush_stats():
+    ops = _take_operations()
+    if ops:
+        await asyncio.to_thread(_write, ops)
+
+async def flush_stats_job(context):
+    """JobQueue callback"""
+    await flush_stats()
+
+def flush_stats_now():
+    ops = _take_operations()
+    if ops:
+        _write(ops)
+
+def load_buckets(scope, owners, granularity, since):
+    """Pre-aggregated buckets for the given owners since `since`"""
+    return list(stats_collection.find({
+        "scope": scope,
+        "owner": {"$in": list(owners)},
+        "granularity": granularity,
+        "bucket": {"$gte": since},
+    }))
+
+def clear_user_stats(user_id: int):
+    stats_collection.delete_many({"scope": USER, "owner": user_id})